@@ -0,0 +1 @@
+"""Simple menu app benchmarks."""
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""Menu tags benchmarks.
+
+Synthetic menus of different size and shape are drawn by every menu
+engine. For every run latency percentiles, queries per render and peak
+memory of render are written to JSON file for comparing with later runs.
+"""
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import argparse
+import datetime
+import json
+import platform
+import sys
+import timeit
+import tracemalloc
+from collections import OrderedDict
+
+import django
+from django.db import connection
+from django.template import Context, Template
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.test.utils import override_settings
+
+from menu import cache
+from menu.models import Item
+from menu.models import Menu
+
+
+# Engine name: (tag, settings)
+ENGINES = OrderedDict([
+    ('sql', ('draw_sql_menu', {'MENU_TREE_CACHE': False})),
+    ('orm', ('draw_orm_menu', {'MENU_TREE_CACHE': False})),
+    ('path', ('draw_path_menu', {'MENU_TREE_CACHE': False})),
+    ('lazy', ('draw_lazy_menu', {'MENU_TREE_CACHE': False})),
+    ('tree', ('draw_sql_menu', {'MENU_TREE_CACHE': True,
+                                'MENU_CACHE': False})),
+    ('fragment', ('draw_sql_menu', {'MENU_TREE_CACHE': True,
+                                    'MENU_CACHE': True})),
+    ('python', ('draw_sql_menu', {'MENU_TREE_CACHE': True,
+                                  'MENU_CACHE': False,
+                                  'MENU_RENDERER': 'python'})),
+])
+
+# Shape name: children per item
+SHAPES = OrderedDict([
+    ('wide', 50),
+    ('balanced', 8),
+    ('deep', 2),
+])
+
+SIZES = (10, 100, 1000, 10000)
+MENU_NAME = 'bench'
+
+
+def generate_menu(size, depth, fanout):
+    """Create menu with given number of items.
+
+    Items are added breadth first with ``fanout`` children per item,
+    but not deeper than ``depth`` levels.
+
+    Returns
+    -------
+    list
+        Paths of root, middle and last (deepest) items and of page
+        without menu item.
+    """
+    Item.objects.all().delete()
+    Menu.objects.all().delete()
+    menu = Menu.objects.create(name=MENU_NAME, depth=depth)
+
+    items = []
+    queue = [(None, '', 0)]
+    while queue and len(items) < size:
+        parent_id, parent_path, level = queue.pop(0)
+        if level >= depth:
+            continue
+        for i in range(fanout):
+            if len(items) >= size:
+                break
+            item_id = len(items) + 1
+            path = '{}{}/'.format(parent_path, item_id)
+            items.append(Item(id=item_id, menu=menu, parent_id=parent_id,
+                              name='Item {}'.format(item_id),
+                              url='/p/{}'.format(item_id),
+                              order=i, path=path))
+            queue.append((item_id, path, level + 1))
+
+    Item.objects.bulk_create(items, batch_size=500)
+    cache.clear()
+    return ['/p/1', '/p/{}'.format(len(items) // 2 + 1),
+            '/p/{}'.format(len(items)), '/p/0']
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile of sorted values."""
+    index = int(round(percent / 100.0 * len(values) + 0.5)) - 1
+    return values[max(0, min(index, len(values) - 1))]
+
+
+def measure(engine, paths, repeat):
+    """Draw menu for every path ``repeat`` times with given engine."""
+    tag, options = ENGINES[engine]
+    template = Template('{% load menus %}{% ' + tag + ' "' + MENU_NAME + '" %}')
+    factory = RequestFactory()
+
+    def render(path):
+        return template.render(Context({'request': factory.get(path)}))
+
+    with override_settings(**options):
+        cache.clear()
+        cache.get_backend().clear()
+
+        # Warm up caches
+        for path in paths:
+            render(path)
+
+        timings = []
+        for i in range(repeat):
+            for path in paths:
+                start = timeit.default_timer()
+                render(path)
+                timings.append((timeit.default_timer() - start) * 1000)
+
+        with CaptureQueriesContext(connection) as queries:
+            for path in paths:
+                render(path)
+
+        tracemalloc.start()
+        for path in paths:
+            render(path)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    timings.sort()
+    return OrderedDict([
+        ('renders', len(timings)),
+        ('mean_ms', sum(timings) / len(timings)),
+        ('p50_ms', percentile(timings, 50)),
+        ('p90_ms', percentile(timings, 90)),
+        ('p99_ms', percentile(timings, 99)),
+        ('max_ms', timings[-1]),
+        ('queries', len(queries) / float(len(paths))),
+        ('peak_kb', peak / 1024.0),
+    ])
+
+
+def run(sizes, shapes, engines, depth, repeat):
+    """Run benchmarks, print and return results."""
+    results = []
+    print('{:<10} {:>7} {:<9} {:>9} {:>9} {:>9} {:>7} {:>10}'.format(
+        'engine', 'size', 'shape', 'p50 ms', 'p90 ms', 'p99 ms',
+        'queries', 'peak KB'))
+    for size in sizes:
+        for shape in shapes:
+            paths = generate_menu(size, depth, SHAPES[shape])
+            for engine in engines:
+                result = measure(engine, paths, repeat)
+                print('{:<10} {:>7} {:<9} {:>9.3f} {:>9.3f} {:>9.3f} '
+                      '{:>7.1f} {:>10.1f}'.format(
+                          engine, size, shape, result['p50_ms'],
+                          result['p90_ms'], result['p99_ms'],
+                          result['queries'], result['peak_kb']))
+                sys.stdout.flush()
+                results.append(OrderedDict(
+                    [('engine', engine), ('size', size), ('shape', shape),
+                     ('depth', depth)] + list(result.items())))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES,
+                        help='Number of menu items, up to 50000')
+    parser.add_argument('--shapes', nargs='+', default=list(SHAPES),
+                        choices=list(SHAPES))
+    parser.add_argument('--engines', nargs='+', default=list(ENGINES),
+                        choices=list(ENGINES))
+    parser.add_argument('--depth', type=int, default=15,
+                        help='Maximum nesting level')
+    parser.add_argument('--repeat', type=int, default=20,
+                        help='Renders of every page')
+    parser.add_argument('--output', default='bench_output.json',
+                        help='JSON results file')
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.shapes, args.engines,
+                  args.depth, args.repeat)
+    with open(args.output, 'w') as output:
+        json.dump(OrderedDict([
+            ('date', datetime.datetime.utcnow().isoformat()),
+            ('python', platform.python_version()),
+            ('django', django.get_version()),
+            ('database', connection.vendor),
+            ('results', results),
+        ]), output, indent=2)
+    print('Results are written to {}'.format(args.output))
@@ -0,0 +1,40 @@
+import os
+
+SECRET_KEY = 'fake-key'
+INSTALLED_APPS = [
+    "menu",
+]
+ROOT_URLCONF = 'benchmarks.urls'
+
+# Set MENU_BENCH_POSTGRES to database name to run on local PostgreSQL,
+# connection is set with PGHOST, PGPORT, PGUSER, PGPASSWORD variables
+if os.environ.get('MENU_BENCH_POSTGRES'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ['MENU_BENCH_POSTGRES'],
+            'HOST': os.environ.get('PGHOST', ''),
+            'PORT': os.environ.get('PGPORT', ''),
+            'USER': os.environ.get('PGUSER', ''),
+            'PASSWORD': os.environ.get('PGPASSWORD', ''),
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+        }
+    }
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [],
+        'APP_DIRS': True,
+    },
+]
@@ -0,0 +1,10 @@
+from django.conf.urls import url
+
+
+def view(request, pk):
+    pass
+
+
+urlpatterns = [
+    url(r'^p/(?P<pk>\d+)$', view, name='page'),
+]
@@ -1,7 +1,22 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import json
+
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.core.exceptions import ValidationError
+from django.db.models import Count
+from django.http import Http404
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.template.response import TemplateResponse
+from django.views.decorators.http import require_POST
+
+try:
+    from django.urls import re_path
+except ImportError:  # Django < 2.0
+    from django.conf.urls import url as re_path
 
 from menu.models import Item
 from menu.models import Menu
@@ -15,6 +30,7 @@ class ItemAdmin(admin.ModelAdmin):
     list_select_related = ('menu',)
     search_fields = ('name',)
     ordering = ('menu', 'parent', 'order', 'name')
+    raw_id_fields = ('parent',)
 
     def save_model(self, request, obj, form, change):
         super(ItemAdmin, self).save_model(request, obj, form, change)
@@ -23,10 +39,121 @@ class ItemAdmin(admin.ModelAdmin):
 class ItemInline(admin.TabularInline):
     model = Item
     ordering = ('menu', 'parent', 'order', 'name')
+    # Select with all items of all menus in every row is too slow
+    raw_id_fields = ('parent',)
 
 
 @admin.register(Menu)
 class MenuAdmin(admin.ModelAdmin):
+    """Menu admin with tree editor.
+
+    Items are edited inline for menus up to ``inline_limit`` items,
+    bigger menus are edited in tree editor only. Tree editor loads
+    children of expanded items on demand and saves all moves at once.
+    """
+
     inlines = [
         ItemInline,
     ]
+    actions = ['publish']
+    readonly_fields = ('published',)
+    change_form_template = 'admin/menu/menu/change_form.html'
+    inline_limit = 100
+    children_limit = 500
+
+    def publish(self, request, queryset):
+        for menu in queryset:
+            menu.publish()
+        self.message_user(request, 'Published {} menus'.format(
+            len(queryset)))
+    publish.short_description = 'Publish selected menus'
+
+    def get_inline_instances(self, request, obj=None):
+        if obj is not None and \
+                obj.item_set.count() > self.inline_limit:
+            return []
+        return super(MenuAdmin, self).get_inline_instances(request, obj)
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        wrap = self.admin_site.admin_view
+        return [
+            re_path(r'^(.+)/tree/$', wrap(self.tree_view),
+                    name='%s_%s_tree' % info),
+            re_path(r'^(.+)/tree/children/$', wrap(self.children_view),
+                    name='%s_%s_tree_children' % info),
+            re_path(r'^(.+)/tree/move/$',
+                    wrap(require_POST(self.move_view)),
+                    name='%s_%s_tree_move' % info),
+        ] + super(MenuAdmin, self).get_urls()
+
+    def get_menu(self, request, object_id):
+        menu = self.get_object(request, object_id)
+        if menu is None:
+            raise Http404
+        if not self.has_change_permission(request, menu):
+            raise PermissionDenied
+        return menu
+
+    def tree_view(self, request, object_id):
+        """Page of tree editor."""
+        menu = self.get_menu(request, object_id)
+        context = dict(
+            self.admin_site.each_context(request),
+            opts=self.model._meta,
+            original=menu,
+            title='Edit tree of {}'.format(menu),
+        )
+        return TemplateResponse(request, 'admin/menu/menu/tree.html',
+                                context)
+
+    def children_view(self, request, object_id):
+        """JSON list of item's children, root items without ``parent``.
+
+        Query parameters ``offset`` and ``limit`` page through long lists
+        of children.
+        """
+        menu = self.get_menu(request, object_id)
+        parent = request.GET.get('parent') or None
+        try:
+            offset = max(0, int(request.GET.get('offset', 0)))
+            limit = int(request.GET.get('limit', self.children_limit))
+            limit = max(1, min(limit, self.children_limit))
+            if parent is not None:
+                parent = get_object_or_404(Item, pk=int(parent),
+                                           menu=menu).pk
+        except ValueError:
+            raise Http404
+
+        items = Item.objects.filter(menu=menu, parent_id=parent) \
+            .annotate(children_count=Count('children')) \
+            .order_by('order', 'id') \
+            .values('id', 'name', 'url', 'order', 'children_count')
+        items = list(items[offset:offset + limit + 1])
+        return JsonResponse({
+            'parent': parent,
+            'items': items[:limit],
+            'more': len(items) > limit,
+        })
+
+    def move_view(self, request, object_id):
+        """Apply list of moves posted as JSON.
+
+        Body is ``{"moves": [{"id": 1, "parent": null, "order": 0}]}``,
+        all moves are saved in one transaction or none at all.
+        """
+        menu = self.get_menu(request, object_id)
+        try:
+            data = json.loads(request.body.decode('utf-8'))
+            moves = [(int(move['id']),
+                      None if move['parent'] is None else int(move['parent']),
+                      int(move['order']))
+                     for move in data['moves']]
+        except (ValueError, TypeError, KeyError):
+            return JsonResponse({'error': 'Bad request'}, status=400)
+
+        try:
+            menu.move_items(moves)
+        except ValidationError as e:
+            return JsonResponse({'error': '; '.join(e.messages)}, status=400)
+        return JsonResponse({'moved': len(moves)})
@@ -6,3 +6,8 @@ from django.apps import AppConfig
 
 class MenuConfig(AppConfig):
     name = 'menu'
+
+    def ready(self):
+        from menu import signals  # noqa
+        from menu.instrumentation import connect_receivers
+        connect_receivers()
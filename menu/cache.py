@@ -0,0 +1,533 @@
+# -*- coding: utf-8 -*-
+"""Process-wide and request cache of compiled menu trees and rendered menus."""
+from __future__ import unicode_literals
+
+import hashlib
+import sys
+import threading
+import time
+import timeit
+from collections import OrderedDict
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.urls import get_script_prefix
+from django.urls import get_urlconf
+
+from menu import instrumentation
+from menu import routers
+from menu.tree import MenuTree
+from menu.tree import get_menu_key
+from menu.tree import split_menu_key
+from menu.utils import get_current_url
+
+
+class TreeCache(object):
+    """Process cache of menu trees by menu key, least recently used first.
+
+    Number of trees and their approximate size in bytes are limited by
+    ``MENU_TREE_CACHE_ENTRIES`` and ``MENU_TREE_CACHE_BYTES`` settings,
+    least recently used trees are evicted over limits. Without limits
+    trees are never evicted and reads do not reorder them.
+    """
+
+    # Approximate bytes of index entries of one item
+    ITEM_OVERHEAD = 300
+    # Approximate bytes of one item in path trie
+    TRIE_OVERHEAD = 250
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.trees = OrderedDict()
+        self.sizes = dict()
+        self.bytes = 0
+        self.bounded = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __getitem__(self, key):
+        if not self.bounded:
+            try:
+                tree = self.trees[key]
+            except KeyError:
+                self.misses += 1
+                raise
+            self.hits += 1
+            return tree
+
+        with self.lock:
+            try:
+                tree = self.trees.pop(key)
+            except KeyError:
+                self.misses += 1
+                raise
+            self.trees[key] = tree
+            self.hits += 1
+            return tree
+
+    def __delitem__(self, key):
+        with self.lock:
+            self._discard(key)
+
+    def __len__(self):
+        return len(self.trees)
+
+    def items(self):
+        with self.lock:
+            return list(self.trees.items())
+
+    def update(self, trees):
+        """Cache trees by key, evict least recently used over limits."""
+        max_entries = getattr(settings, 'MENU_TREE_CACHE_ENTRIES', None)
+        max_bytes = getattr(settings, 'MENU_TREE_CACHE_BYTES', None)
+        with self.lock:
+            self.bounded = max_entries is not None or max_bytes is not None
+            for key, tree in trees.items():
+                self._discard(key)
+                self.trees[key] = tree
+                self.sizes[key] = self.get_size(tree)
+                self.bytes += self.sizes[key]
+            while self.trees and (
+                    (max_entries is not None and
+                     len(self.trees) > max_entries) or
+                    (max_bytes is not None and self.bytes > max_bytes)):
+                self._discard(next(iter(self.trees)))
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.trees.clear()
+            self.sizes.clear()
+            self.bytes = 0
+
+    def stats(self):
+        """Return dict of entries, bytes, hits, misses and evictions."""
+        return {'entries': len(self.trees), 'bytes': self.bytes,
+                'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions}
+
+    def reset_stats(self):
+        self.hits = self.misses = self.evictions = 0
+
+    def _discard(self, key):
+        if key in self.trees:
+            del self.trees[key]
+            self.bytes -= self.sizes.pop(key)
+
+    @classmethod
+    def get_size(cls, tree):
+        """Approximate memory used by tree, unknown menus take little.
+
+        Path tries and pruned trees are built later, so their limits
+        are counted upfront. Pruned trees share nodes of the tree.
+        """
+        if tree is None:
+            return sys.getsizeof(None)
+        index = sys.getsizeof(tree.items) + sys.getsizeof(tree.children) + \
+            sys.getsizeof(tree.urls) + \
+            sum(sys.getsizeof(nodes) for nodes in tree.children.values())
+        size = index + len(tree.items) * tree.MAX_TRIES * cls.TRIE_OVERHEAD
+        if tree.masks:
+            size += tree.MAX_PRUNED * index
+        for node in tree.items.values():
+            size += sys.getsizeof(node) + sys.getsizeof(node.name) + \
+                sys.getsizeof(node.url) + cls.ITEM_OVERHEAD
+        return size
+
+
+_trees = TreeCache()
+# Versions of cached trees and times of their last check by menu name
+_versions = dict()
+_checked = dict()
+_lock = threading.Lock()
+_generation = [0]
+_version_reads = [0]
+
+
+def get_tree(menu_name, request=None):
+    """Return cached MenuTree for menu key, load it on first use.
+
+    Unknown menu names are cached as None too. Tree is loaded again
+    when its version is changed by another process (see
+    ``check_versions``).
+
+    Parameters
+    ----------
+    menu_name : str or tuple
+        Menu name or key of site's menu, see ``get_menu_key``.
+    request : django.http.HttpRequest, optional
+        Current request, versions are checked once per request.
+    """
+    try:
+        tree = _trees[menu_name]
+    except KeyError:
+        pass
+    else:
+        if not check_versions([menu_name], request):
+            return tree
+
+    stats = instrumentation.active()
+    if stats is not None:
+        stats.tree_cache = 'miss'
+    generation = get_generation()
+    # Version is read before data, so fragments of newer data may get
+    # older version, but never vice versa
+    version = get_version(menu_name)
+    tree = MenuTree.load(menu_name)
+    store({menu_name: tree}, {menu_name: version}, generation)
+    return tree
+
+
+def get_trees(menu_names, request=None):
+    """Return cached MenuTree or None by menu name for several menus.
+
+    Menus not cached yet are loaded together with one items query.
+    """
+    trees, missing = lookup(menu_names, request)
+    if not missing:
+        return trees
+
+    generation = get_generation()
+    versions = get_versions(missing)
+    trees.update(store(MenuTree.load_many(missing), versions, generation))
+    return trees
+
+
+def lookup(menu_names, request=None):
+    """Return cached trees by menu name and list of not cached names.
+
+    Trees changed by other processes are returned as not cached.
+    """
+    trees = dict()
+    missing = []
+    for name in menu_names:
+        try:
+            trees[name] = _trees[name]
+        except KeyError:
+            missing.append(name)
+    for name in check_versions(list(trees), request):
+        del trees[name]
+        missing.append(name)
+    if missing:
+        stats = instrumentation.active()
+        if stats is not None:
+            stats.tree_cache = 'miss'
+    return trees, missing
+
+
+def check_versions(menu_names, request=None):
+    """Return names of cached menus with outdated versions.
+
+    Versions in the shared cache are changed by processes saving menus.
+    Every menu is checked at most once per ``MENU_VERSION_TTL`` seconds
+    and once per request, all due menus with one cache request. Nothing
+    is checked when the setting is None.
+    """
+    ttl = getattr(settings, 'MENU_VERSION_TTL', 0)
+    if ttl is None or not menu_names:
+        return []
+
+    now = timeit.default_timer()
+    checked = getattr(request, '_menu_checked', ())
+    names = [name for name in menu_names if name not in checked and
+             (name not in _checked or now - _checked[name] >= ttl)]
+    if not names:
+        return []
+
+    versions = get_versions(names)
+    stale = [name for name in names if versions[name] != _versions.get(name)]
+    if stale:
+        routers.pin_primary()
+    with _lock:
+        for name in names:
+            _checked[name] = now
+    if request is not None:
+        if not hasattr(request, '_menu_checked'):
+            request._menu_checked = set()
+        request._menu_checked.update(names)
+    return stale
+
+
+def get_generation():
+    """Return counter of invalidations, taken before loading trees."""
+    return _generation[0]
+
+
+def get_version_reads():
+    """Return counter of version reads, unchanged while nothing is drawn."""
+    return _version_reads[0]
+
+
+def store(trees, versions, generation):
+    """Cache loaded trees unless menus were changed while loading.
+
+    Parameters
+    ----------
+    trees : dict
+        MenuTree or None by menu name.
+    versions : dict
+        Menu versions by menu name, read before loading trees.
+    generation : int
+        Result of get_generation() before loading trees.
+    """
+    for name, tree in trees.items():
+        if tree is not None:
+            tree.version = versions[name]
+    with _lock:
+        if generation == _generation[0]:
+            _trees.update(trees)
+            _versions.update((name, versions[name]) for name in trees)
+    return trees
+
+
+def preload(request, menu_names):
+    """Load trees of several menus for the request.
+
+    Trees are taken from process cache when ``MENU_TREE_CACHE`` is on,
+    otherwise they are loaded from database and used for this request
+    only.
+    """
+    keys = dict((menu_key(request, name), name) for name in menu_names)
+    if getattr(settings, 'MENU_TREE_CACHE', True):
+        trees = get_trees(list(keys), request)
+    else:
+        trees = MenuTree.load_many(list(keys))
+    trees = dict((keys[key], tree) for key, tree in trees.items())
+    set_request_trees(request, trees)
+    return trees
+
+
+def set_request_trees(request, trees):
+    """Keep trees for menu tags of the request."""
+    if not hasattr(request, '_menu_trees'):
+        request._menu_trees = dict()
+    request._menu_trees.update(trees)
+
+
+def get_ancestry(request, menu_name):
+    """Return items from root to current item of menu for the request.
+
+    Ancestry kept by menu tag drawn before is used. Otherwise it is
+    taken from request's tree, and without tree cache the tree is
+    loaded once and kept for later menu tags of the request.
+    """
+    try:
+        return request._menu_ancestry[menu_name]
+    except (AttributeError, KeyError):
+        pass
+
+    if not has_tree(request, menu_name):
+        preload(request, [menu_name])
+    tree = get_request_tree(request, menu_name)
+    ancestry = []
+    if tree is not None:
+        ancestry = tree.get_ancestry(*get_current_url(request))
+    set_ancestry(request, menu_name, ancestry)
+    return ancestry
+
+
+def set_ancestry(request, menu_name, ancestry):
+    """Keep items from root to current item for breadcrumbs."""
+    if not hasattr(request, '_menu_ancestry'):
+        request._menu_ancestry = dict()
+    request._menu_ancestry.setdefault(menu_name, ancestry)
+
+
+def has_tree(request, menu_name):
+    """Check if menu tag may draw menu from tree without queries."""
+    return getattr(settings, 'MENU_TREE_CACHE', True) or \
+        menu_name in getattr(request, '_menu_trees', ())
+
+
+def get_request_tree(request, menu_name):
+    """Return tree preloaded for the request or cached tree.
+
+    Tree is pruned by visibility rules for request's user.
+    """
+    try:
+        tree = request._menu_trees[menu_name]
+    except (AttributeError, KeyError):
+        tree = get_tree(menu_key(request, menu_name), request)
+    if tree is not None:
+        tree = tree.for_user(getattr(request, 'user', None))
+    return tree
+
+
+def get_site_id(request=None):
+    """Return id of request's site or ``SITE_ID`` setting.
+
+    Site is taken from ``request.site`` set by CurrentSiteMiddleware or
+    found by django.contrib.sites when it is installed.
+    """
+    site = getattr(request, 'site', None)
+    if site is None:
+        if request is None or \
+                not apps.is_installed('django.contrib.sites'):
+            return getattr(settings, 'SITE_ID', None)
+        from django.contrib.sites.shortcuts import get_current_site
+        site = get_current_site(request)
+    return getattr(site, 'id', None)
+
+
+def menu_key(request, menu_name):
+    """Return key of menu drawn for request in caches."""
+    if not getattr(settings, 'MENU_SITES', False):
+        return menu_name
+    return get_menu_key(get_site_id(request), menu_name)
+
+
+def get_stats():
+    """Return stats of process tree cache, see TreeCache.stats."""
+    return _trees.stats()
+
+
+def invalidate(menu_id=None):
+    """Drop cached tree of menu with given id, or all trees."""
+    # Trees loaded next must not come from lagging replica
+    routers.pin_primary()
+    with _lock:
+        _generation[0] += 1
+        if menu_id is None:
+            _trees.clear()
+            _versions.clear()
+            _checked.clear()
+            return
+        for name, tree in list(_trees.items()):
+            if tree is not None and tree.menu_id == menu_id:
+                del _trees[name]
+
+
+def menu_changed(menu_name=None, menu_id=None):
+    """Drop cached trees and rendered menus of changed menu.
+
+    Called on Menu and Item signals, call it after changes without
+    signals, like ``bulk_create`` or ``update``. ``menu_name`` of site's
+    menu is ``get_menu_key(menu.site_id, menu.name)``.
+    """
+    invalidate(menu_id)
+    if menu_name is not None:
+        bump_version(menu_name)
+
+
+def clear():
+    """Drop all cached trees."""
+    invalidate()
+
+
+def get_backend():
+    """Return Django cache used for rendered menus and versions."""
+    return caches[getattr(settings, 'MENU_CACHE_ALIAS', 'default')]
+
+
+def _version_key(menu_name):
+    return 'menu:version:{}'.format(_digest(menu_name))
+
+
+def _version_keys(menu_name):
+    """Return cache keys of versions making up version of menu key.
+
+    Site's menu depends on versions of menu name, changed with menus
+    for all sites, and of site's menu name.
+    """
+    site_id, name = split_menu_key(menu_name)
+    if site_id is None:
+        return [_version_key(name)]
+    return [_version_key(name),
+            'menu:version:{}:{}'.format(site_id, _digest(name))]
+
+
+def _digest(*parts):
+    value = ':'.join('{}'.format(part) for part in parts)
+    return hashlib.md5(value.encode('utf-8')).hexdigest()
+
+
+def _initial_version():
+    # Evicted counter must not start from already used versions
+    return int(time.time() * 1000)
+
+
+def get_version(menu_name):
+    """Return menu version shared by all processes.
+
+    Version of menu name is integer, version of site's menu key is
+    string joining versions of name and of site's name.
+    """
+    return _read_versions([menu_name])[menu_name]
+
+
+def get_versions(menu_names):
+    """Return versions of several menus with one cache request."""
+    return _read_versions(menu_names)
+
+
+def _read_versions(menu_names):
+    _version_reads[0] += 1
+    backend = get_backend()
+    keys = dict((name, _version_keys(name)) for name in menu_names)
+    found = backend.get_many(
+        set(key for parts in keys.values() for key in parts))
+    versions = dict()
+    for name, parts in keys.items():
+        for key in parts:
+            if key not in found:
+                backend.add(key, _initial_version(), None)
+                found[key] = backend.get(key)
+        if len(parts) == 1:
+            versions[name] = found[parts[0]]
+        else:
+            versions[name] = '.'.join('{}'.format(found[key])
+                                      for key in parts)
+    return versions
+
+
+def bump_version(menu_name):
+    """Change menu version, so all rendered menus become outdated.
+
+    Bumping menu name changes versions of all sites' menus with this
+    name, bumping site's menu key changes version of the site's menu.
+    """
+    backend = get_backend()
+    key = _version_keys(menu_name)[-1]
+    try:
+        return backend.incr(key)
+    except ValueError:
+        version = _initial_version()
+        backend.set(key, version, None)
+        return version
+
+
+def fragment_key(tree, variant, item_id):
+    """Return cache key of rendered menu.
+
+    Parameters
+    ----------
+    tree : menu.tree.MenuTree
+        Cached menu tree with version.
+    variant : str or tuple
+        Tag variant, like (tag name, renderer, autoescape), menus with
+        different levels or HTML for one item differ.
+    item_id : int
+        Current item's id or None when nothing matched.
+    """
+    # Users with the same rights for menu's rules share rendered menus
+    return 'menu:html:{}'.format(_digest(
+        tree.name, tree.site_id, tree.version, variant,
+        'none' if item_id is None else item_id,
+        get_urlconf(), get_script_prefix(), tree.rights))
+
+
+def menu_etag(menu_name, version, item_id, rights=None):
+    """Return ETag of menu drawn for current item, like fragment_key.
+
+    Parameters
+    ----------
+    menu_name : str or tuple
+        Menu name or key of site's menu.
+    rights : int, optional
+        User's rights of tree pruned by visibility rules.
+    """
+    return '"{}"'.format(_digest(
+        menu_name, version, 'none' if item_id is None else item_id,
+        get_urlconf(), get_script_prefix(), rights))
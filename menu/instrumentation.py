@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""Menu drawing instrumentation.
+
+Every menu tag sends ``menu_rendered`` signal with ``RenderStats``
+of the render. Nothing is measured when signal has no receivers.
+
+Receivers listed in ``MENU_INSTRUMENTATION`` setting are connected on
+startup, for example::
+
+    MENU_INSTRUMENTATION = [
+        'menu.instrumentation.log_stats',
+        'menu.instrumentation.counters',
+    ]
+"""
+from __future__ import unicode_literals
+
+import logging
+import threading
+import timeit
+
+from django.conf import settings
+from django.dispatch import Signal
+from django.utils.module_loading import import_string
+
+
+logger = logging.getLogger('menu')
+
+# Sent with stats=RenderStats after every menu tag
+menu_rendered = Signal()
+
+_local = threading.local()
+
+
+class RenderStats(object):
+    """Timings and counters of one menu render.
+
+    Times are in seconds. ``build_time`` excludes query and URL reverse
+    time. Cache fields are 'hit', 'miss' or None when cache is not used.
+    """
+
+    def __init__(self, tag, menu_name):
+        self.tag = tag
+        self.menu_name = menu_name
+        self.queries = 0
+        self.query_time = 0.0
+        self.reversed = 0
+        self.reverse_time = 0.0
+        self.build_time = 0.0
+        self.render_time = 0.0
+        self.total_time = 0.0
+        self.items = 0
+        self.tree_cache = None
+        self.fragment_cache = None
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        """Database execute wrapper counting queries and their time."""
+        start = timeit.default_timer()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.query_time += timeit.default_timer() - start
+
+
+def active():
+    """Return stats of current thread's render or None."""
+    return getattr(_local, 'stats', None)
+
+
+def start(tag, menu_name):
+    """Start measuring render if anybody listens for stats."""
+    if not menu_rendered.has_listeners():
+        return None
+    stats = _local.stats = RenderStats(tag, menu_name)
+    return stats
+
+
+def finish(stats, sender=None):
+    """Stop measuring and send stats."""
+    _local.stats = None
+    stats.build_time = max(
+        0.0, stats.build_time - stats.query_time - stats.reverse_time)
+    menu_rendered.send(sender=sender, stats=stats)
+
+
+def log_stats(sender, stats, **kwargs):
+    """Receiver writing every render's stats to 'menu' logger."""
+    logger.debug(
+        'menu "%s" %s: %.2f ms total, %d queries %.2f ms, build %.2f ms, '
+        '%d URLs reversed %.2f ms, render %.2f ms, %d items, '
+        'tree cache %s, rendered cache %s',
+        stats.menu_name, stats.tag, stats.total_time * 1000,
+        stats.queries, stats.query_time * 1000, stats.build_time * 1000,
+        stats.reversed, stats.reverse_time * 1000,
+        stats.render_time * 1000, stats.items,
+        stats.tree_cache, stats.fragment_cache)
+
+
+class Counters(object):
+    """Receiver aggregating stats by menu in process memory.
+
+    Totals are written to Django cache (``MENU_CACHE_ALIAS``) at most
+    once per ``MENU_STATS_INTERVAL`` seconds, so ``menu_stats``
+    management command can dump totals of all processes sharing cache.
+    """
+
+    FIELDS = ('queries', 'query_time', 'reversed', 'reverse_time',
+              'build_time', 'render_time', 'total_time', 'items')
+    PLURALS = {'hit': 'hits', 'miss': 'misses'}
+    # Processes take numbered slots with atomic incr of slots counter,
+    # so concurrent processes never overwrite each other's totals
+    SLOTS_KEY = 'menu:stats:slots'
+    SLOT_KEY = 'menu:stats:slot:{}'
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.totals = dict()
+        self.flushed = timeit.default_timer()
+        self.key = None
+
+    def __call__(self, sender, stats, **kwargs):
+        with self.lock:
+            total = self.totals.get(stats.menu_name)
+            if total is None:
+                total = self.totals[stats.menu_name] = dict(
+                    (name, 0) for name in self.FIELDS + (
+                        'renders', 'tree_hits', 'tree_misses',
+                        'fragment_hits', 'fragment_misses'))
+            total['renders'] += 1
+            for name in self.FIELDS:
+                total[name] += getattr(stats, name)
+            if stats.tree_cache:
+                total['tree_' + self.PLURALS[stats.tree_cache]] += 1
+            if stats.fragment_cache:
+                total['fragment_' + self.PLURALS[stats.fragment_cache]] += 1
+
+        interval = getattr(settings, 'MENU_STATS_INTERVAL', 60)
+        if timeit.default_timer() - self.flushed >= interval:
+            self.flush()
+
+    def snapshot(self):
+        """Return copy of totals by menu name."""
+        with self.lock:
+            return dict((name, dict(total))
+                        for name, total in self.totals.items())
+
+    def reset(self):
+        with self.lock:
+            self.totals.clear()
+
+    def flush(self):
+        """Write totals of this process to Django cache."""
+        from menu.cache import get_backend
+
+        self.flushed = timeit.default_timer()
+        backend = get_backend()
+        if self.key is None:
+            backend.add(self.SLOTS_KEY, 0, None)
+            self.key = self.SLOT_KEY.format(backend.incr(self.SLOTS_KEY))
+        backend.set(self.key, self.snapshot(), 24 * 60 * 60)
+
+    @classmethod
+    def collect(cls):
+        """Return totals of all processes from Django cache."""
+        from menu.cache import get_backend
+
+        backend = get_backend()
+        totals = dict()
+        for snapshot in backend.get_many(cls.get_slot_keys()).values():
+            for name, total in snapshot.items():
+                result = totals.setdefault(name, dict())
+                for field, value in total.items():
+                    result[field] = result.get(field, 0) + value
+        return totals
+
+    @classmethod
+    def clear(cls):
+        """Delete totals of all processes from Django cache."""
+        from menu.cache import get_backend
+
+        # Slots counter is kept, so running processes keep own slots
+        get_backend().delete_many(cls.get_slot_keys())
+
+    @classmethod
+    def get_slot_keys(cls):
+        """Return cache keys of all slots taken by processes."""
+        from menu.cache import get_backend
+
+        slots = get_backend().get(cls.SLOTS_KEY) or 0
+        return [cls.SLOT_KEY.format(slot) for slot in range(1, slots + 1)]
+
+
+counters = Counters()
+
+
+def connect_receivers():
+    """Connect receivers from ``MENU_INSTRUMENTATION`` setting."""
+    for path in getattr(settings, 'MENU_INSTRUMENTATION', ()):
+        menu_rendered.connect(import_string(path),
+                              dispatch_uid='menu:{}'.format(path))
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""Export menus as JSON lines."""
+from __future__ import unicode_literals
+
+import json
+
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from menu.models import Item
+from menu.models import Menu
+
+
+class Command(BaseCommand):
+    help = ('Export menus as JSON lines, one menu or item per line. '
+            'Item\'s parent is set with parent\'s URL.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('menu_names', nargs='*',
+                            help='Menus to export, all by default')
+        parser.add_argument('--output', '-o', default='-',
+                            help='Output file, stdout by default')
+
+    def handle(self, *args, **options):
+        # Menus for all sites, site's menus have the same names
+        menus = Menu.objects.filter(site_id__isnull=True).order_by('name')
+        if options['menu_names']:
+            menus = menus.filter(name__in=options['menu_names'])
+            missing = set(options['menu_names']) - \
+                set(menus.values_list('name', flat=True))
+            if missing:
+                raise CommandError('Menus not found: {}'.format(
+                    ', '.join(sorted(missing))))
+
+        if options['output'] == '-':
+            self.write_menus(menus, self.stdout)
+        else:
+            with open(options['output'], 'w') as output:
+                self.write_menus(menus, output)
+
+    def write_menus(self, menus, output):
+        for menu in menus:
+            self.write(output, {'model': 'menu', 'name': menu.name,
+                                'depth': menu.depth})
+
+            # Parents go before children in path order
+            items = Item.objects.filter(menu_id=menu.id) \
+                .order_by('path', 'id') \
+                .values_list('name', 'url', 'order', 'parent__url',
+                             *Item.RULE_FIELDS)
+            for name, url, order, parent, visibility, permission \
+                    in items.iterator():
+                record = {'model': 'item', 'menu': menu.name,
+                          'name': name, 'url': url,
+                          'order': order, 'parent': parent}
+                # Rules are written for items having them only
+                if visibility:
+                    record['visibility'] = visibility
+                if permission:
+                    record['permission'] = permission
+                self.write(output, record)
+
+    def write(self, output, record):
+        output.write(json.dumps(record, sort_keys=True) + '\n')
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""Import menus exported by menu_export command."""
+from __future__ import unicode_literals
+
+import io
+import json
+import sys
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import connections
+from django.db import router
+from django.db import transaction
+
+from menu.models import Item
+from menu.models import Menu
+from menu.models import validate_url
+
+
+class Command(BaseCommand):
+    help = ('Import menus from JSON lines written by menu_export. '
+            'Items are created level by level with bulk_create.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', nargs='?', default='-',
+                            help='Input file, stdin by default')
+        parser.add_argument('--replace', action='store_true',
+                            help='Delete items of existing menus')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--skip-validation', action='store_true',
+                            help='Do not check item URLs')
+
+    def handle(self, *args, **options):
+        if options['input'] == '-':
+            menus = self.read(sys.stdin)
+        else:
+            with io.open(options['input'], encoding='utf-8') as source:
+                menus = self.read(source)
+
+        if not options['skip_validation']:
+            self.validate_urls(menus)
+
+        # Deletes, inserts and paths go to the same database
+        self.using = router.db_for_write(Item)
+        with transaction.atomic(using=self.using):
+            for name, (depth, items) in menus.items():
+                self.import_menu(name, depth, items, options)
+
+        self.stdout.write('Imported {} menus, {} items'.format(
+            len(menus), sum(len(items) for depth, items in menus.values())))
+
+    def read(self, source):
+        """Return (depth, items) by menu name."""
+        menus = OrderedDict()
+        for number, line in enumerate(source, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                if record['model'] == 'menu':
+                    menus.setdefault(record['name'], [None, []])[0] = \
+                        record.get('depth')
+                elif record['model'] == 'item':
+                    menus.setdefault(record['menu'], [None, []])[1].append(
+                        (record['url'], record['name'],
+                         record.get('order', 0), record.get('parent'),
+                         record.get('visibility', ''),
+                         record.get('permission', '')))
+                else:
+                    raise ValueError('unknown model')
+            except (ValueError, KeyError, TypeError) as e:
+                raise CommandError('Line {}: {}'.format(number, e))
+        return menus
+
+    def validate_urls(self, menus):
+        """Check every distinct URL once."""
+        urls = set()
+        for depth, items in menus.values():
+            urls.update(item[0] for item in items)
+
+        errors = []
+        for url in sorted(urls):
+            try:
+                validate_url(url)
+            except ValidationError as e:
+                errors.append('{}: {}'.format(url, '; '.join(e.messages)))
+        if errors:
+            raise CommandError('Bad URLs:\n' + '\n'.join(errors))
+
+    def import_menu(self, name, depth, items, options):
+        # Menus are exported and imported for all sites
+        menu, created = Menu.objects.using(self.using).get_or_create(
+            name=name, site_id=None)
+        if depth is not None and menu.depth != depth:
+            menu.depth = depth
+            menu.save(update_fields=['depth'])
+        if not created and Item.objects.using(self.using) \
+                .filter(menu=menu).exists():
+            if not options['replace']:
+                raise CommandError('Menu "{}" has items, use --replace'
+                                   .format(name))
+            self.delete_items(menu)
+
+        # Group items by level, parents are found by URL
+        children = dict()
+        urls = set()
+        for item in items:
+            if item[0] in urls:
+                raise CommandError('Menu "{}": duplicate URL "{}"'.format(
+                    name, item[0]))
+            urls.add(item[0])
+            children.setdefault(item[3], []).append(item)
+        missing = set(children) - urls - {None}
+        if missing:
+            raise CommandError('Menu "{}": parents not found: {}'.format(
+                name, ', '.join(sorted(missing))))
+
+        ids = {None: None}
+        level = children.pop(None, [])
+        while level:
+            objs = [Item(menu=menu, url=url, name=item_name, order=order,
+                         parent_id=ids[parent], visibility=visibility,
+                         permission=permission)
+                    for url, item_name, order, parent, visibility, permission
+                    in level]
+            Item.objects.using(self.using).bulk_create(
+                objs, batch_size=options['batch_size'])
+            ids.update(self.get_ids(menu, objs))
+
+            next_level = []
+            for obj in objs:
+                next_level.extend(children.pop(obj.url, ()))
+            level = next_level
+        if children:
+            raise CommandError('Menu "{}": items with parent cycle'
+                               .format(name))
+
+        Item.rebuild_paths(menu.id)
+        transaction.on_commit(menu.changed, using=self.using)
+
+    def delete_items(self, menu):
+        """Delete all items of menu with one query.
+
+        QuerySet.delete() sends signals, so it loads every item and
+        drops cache once per item.
+        """
+        connection = connections[self.using]
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM {} WHERE menu_id = %s'.format(
+                connection.ops.quote_name(Item._meta.db_table)), [menu.id])
+
+    def get_ids(self, menu, objs):
+        """Return ids of created items by URL."""
+        if all(obj.pk for obj in objs):
+            return dict((obj.url, obj.pk) for obj in objs)
+
+        # Database does not return ids from bulk_create
+        ids = dict()
+        urls = [obj.url for obj in objs]
+        for i in range(0, len(urls), 500):
+            ids.update(Item.objects.using(self.using)
+                       .filter(menu=menu, url__in=urls[i:i + 500])
+                       .values_list('url', 'id'))
+        return ids
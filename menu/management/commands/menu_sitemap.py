@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""Write sitemap of menu items' URLs into files."""
+from __future__ import unicode_literals
+
+import io
+import os
+
+from django.core.management.base import BaseCommand
+
+from menu import sitemaps
+
+
+class Command(BaseCommand):
+    help = ('Write sitemap.xml of menu items\' URLs into directory. '
+            'Sitemap is split into sitemap-<n>.xml files listed by '
+            'sitemap.xml index once it passes protocol limits. URLs are '
+            'read in chunks and written right away.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('menu_names', nargs='*',
+                            help='Menus to write, all by default')
+        parser.add_argument('--base-url', required=True,
+                            help='Site URL like https://example.com')
+        parser.add_argument('--output-dir', '-o', default='.')
+        parser.add_argument('--max-urls', type=int,
+                            default=sitemaps.MAX_URLS)
+        parser.add_argument('--max-bytes', type=int,
+                            default=sitemaps.MAX_BYTES)
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        base_url = options['base_url'].rstrip('/')
+        directory = options['output_dir']
+        urls = sitemaps.MenuURLs(options['menu_names'] or None,
+                                 options['chunk_size'])
+        header = len(sitemaps.URLSET_HEADER.encode('utf-8'))
+        footer = len(sitemaps.URLSET_FOOTER.encode('utf-8'))
+
+        names = []
+        output = None
+        count = 0
+        written = 0
+        total = 0
+        try:
+            for path in urls:
+                entry = sitemaps.url_entry(base_url, path)
+                size = len(entry.encode('utf-8'))
+                if output is None or count >= options['max_urls'] or \
+                        written + size + footer > options['max_bytes']:
+                    if output is not None:
+                        output.write(sitemaps.URLSET_FOOTER)
+                        output.close()
+                    names.append('sitemap-{}.xml'.format(len(names) + 1))
+                    output = io.open(os.path.join(directory, names[-1]),
+                                     'w', encoding='utf-8')
+                    output.write(sitemaps.URLSET_HEADER)
+                    count = 0
+                    written = header
+                output.write(entry)
+                count += 1
+                written += size
+                total += 1
+        finally:
+            if output is not None:
+                output.write(sitemaps.URLSET_FOOTER)
+                output.close()
+
+        index = os.path.join(directory, 'sitemap.xml')
+        if len(names) > 1:
+            with io.open(index, 'w', encoding='utf-8') as output:
+                for line in sitemaps.sitemap_index(
+                        '{}/{}'.format(base_url, name) for name in names):
+                    output.write(line)
+        elif names:
+            os.rename(os.path.join(directory, names[0]), index)
+        else:
+            with io.open(index, 'w', encoding='utf-8') as output:
+                for line in sitemaps.urlset(base_url, ()):
+                    output.write(line)
+        self.stdout.write('Wrote {} URLs to {} sitemap files'.format(
+            total, max(len(names), 1)))
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""Dump menu drawing stats aggregated by menu.instrumentation.counters."""
+from __future__ import unicode_literals
+
+from django.core.management.base import BaseCommand
+
+from menu.instrumentation import Counters
+
+
+class Command(BaseCommand):
+    help = 'Show menu drawing stats of all processes sharing menu cache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true',
+                            help='Delete stats after showing')
+
+    def handle(self, *args, **options):
+        totals = Counters.collect()
+        if not totals:
+            self.stdout.write('No stats, check that '
+                              '"menu.instrumentation.counters" is in '
+                              'MENU_INSTRUMENTATION setting and cache '
+                              'is shared between processes.')
+
+        self.stdout.write(
+            '{:<20} {:>8} {:>9} {:>7} {:>9} {:>9} {:>9} {:>9} {:>7} '
+            '{:>6} {:>6}'.format(
+                'menu', 'renders', 'total ms', 'queries', 'query ms',
+                'build ms', 'URL ms', 'render ms', 'items',
+                'tree', 'html'))
+        for name, total in sorted(totals.items()):
+            renders = float(total['renders']) or 1.0
+            self.stdout.write(
+                '{:<20} {:>8} {:>9.3f} {:>7.2f} {:>9.3f} {:>9.3f} {:>9.3f} '
+                '{:>9.3f} {:>7.1f} {:>6} {:>6}'.format(
+                    name, total['renders'],
+                    total['total_time'] * 1000 / renders,
+                    total['queries'] / renders,
+                    total['query_time'] * 1000 / renders,
+                    total['build_time'] * 1000 / renders,
+                    total['reverse_time'] * 1000 / renders,
+                    total['render_time'] * 1000 / renders,
+                    total['items'] / renders,
+                    self.ratio(total['tree_hits'], total['tree_misses']),
+                    self.ratio(total['fragment_hits'],
+                               total['fragment_misses'])))
+
+        if options['reset']:
+            Counters.clear()
+
+    def ratio(self, hits, misses):
+        """Cache hit ratio in percents."""
+        if not hits + misses:
+            return '-'
+        return '{:.0f}%'.format(100.0 * hits / (hits + misses))
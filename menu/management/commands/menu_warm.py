@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""Render menus for all pages into menu cache after deploy."""
+from __future__ import unicode_literals
+
+import timeit
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import connections
+from django.template import Context
+from django.template import Template
+from django.test import RequestFactory
+from django.urls import Resolver404
+from django.urls import resolve
+
+from menu import cache
+from menu.models import Item
+from menu.models import Menu
+from menu.templatetags.menus import menu_tags
+from menu.utils import reverse_url
+
+
+_templates = dict()
+
+
+def warm(task):
+    """Render menu with cache on, return error message or None.
+
+    Parameters
+    ----------
+    task : tuple
+        Tag name, menu name and page path.
+    """
+    tag, menu_name, path = task
+    try:
+        template = _templates.get(tag)
+        if template is None:
+            template = _templates[tag] = Template(
+                '{% load menus %}{% ' + tag + ' menu_name cache=True %}')
+        request = RequestFactory().get(path)
+        template.render(Context({'request': request,
+                                 'menu_name': menu_name}))
+    except Exception as e:
+        return '{} "{}" {}: {!r}'.format(tag, menu_name, path, e)
+
+
+class Command(BaseCommand):
+    help = ('Render menus for URLs of all items and extra paths into '
+            'MENU_CACHE_ALIAS cache. Pages with the same current item '
+            'share rendered menu and are rendered once.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('menu_names', nargs='*',
+                            help='Menus to warm, all by default')
+        parser.add_argument('--paths', nargs='+', default=[],
+                            help='Extra page paths')
+        parser.add_argument('--tags', nargs='+', default=list(menu_tags),
+                            choices=menu_tags,
+                            help='Menu tags used by templates')
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--processes', action='store_true',
+                            help='Use process pool instead of threads, '
+                                 'cache must be shared between processes')
+
+    def handle(self, *args, **options):
+        if not getattr(settings, 'MENU_TREE_CACHE', True):
+            raise CommandError('Menu cache requires MENU_TREE_CACHE')
+
+        start = timeit.default_timer()
+        # Pages are rendered without site, so they draw global menus
+        menus = Menu.objects.filter(site_id__isnull=True).order_by('name')
+        if options['menu_names']:
+            menus = menus.filter(name__in=options['menu_names'])
+        menu_names = list(menus.values_list('name', flat=True))
+        if not menu_names:
+            raise CommandError('No menus to warm')
+
+        pages, skipped = self.get_pages(options['paths'])
+        tasks = [(tag, name, path) for tag in options['tags']
+                 for name, path in self.get_menu_pages(menu_names, pages)]
+
+        if options['processes']:
+            # Forked processes must not share database connections
+            connections.close_all()
+            pool = Pool(options['workers'])
+        else:
+            pool = ThreadPool(options['workers'])
+        errors = 0
+        try:
+            for error in pool.imap_unordered(warm, tasks, chunksize=16):
+                if error is not None:
+                    errors += 1
+                    self.stderr.write(error)
+        finally:
+            pool.close()
+            pool.join()
+
+        seconds = timeit.default_timer() - start
+        self.stdout.write(
+            'Rendered {} menus for {} pages in {:.2f} s, {:.1f} renders/s, '
+            '{} paths not resolved, {} errors'.format(
+                len(tasks), len(pages), seconds,
+                len(tasks) / seconds if seconds else 0.0, skipped, errors))
+
+    def get_pages(self, extra_paths):
+        """Return (path, URL name) of all item URLs and extra paths."""
+        urls = Item.objects.values_list('url', flat=True).distinct()
+        paths = set(extra_paths)
+        for url in urls.iterator():
+            href = reverse_url(url)
+            # External links are not pages of this site
+            if href.startswith('/'):
+                paths.add(href)
+
+        pages = []
+        skipped = 0
+        for path in sorted(paths):
+            try:
+                pages.append((path, resolve(path).url_name))
+            except Resolver404:
+                skipped += 1
+        return pages, skipped
+
+    def get_menu_pages(self, menu_names, pages):
+        """Return (menu name, path) with one path per current item."""
+        trees = cache.get_trees(menu_names)
+        result = []
+        for name in menu_names:
+            if trees[name] is None:
+                continue
+            seen = set()
+            for path, url_name in pages:
+                item_id = trees[name].find_current(path, url_name)
+                if item_id not in seen:
+                    seen.add(item_id)
+                    result.append((name, path))
+        return result
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""Middleware preloading menus before view and pinning menu reads.
+
+Requires Python 3. Under ASGI menus are loaded in thread before view.
+"""
+from __future__ import unicode_literals
+
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+try:
+    from asgiref.sync import iscoroutinefunction
+    from asgiref.sync import markcoroutinefunction
+except ImportError:  # asgiref < 3.6
+    from asyncio import iscoroutinefunction
+
+    def markcoroutinefunction(func):
+        func._is_coroutine = asyncio.coroutines._is_coroutine
+        return func
+
+from menu import cache
+from menu import routers
+
+
+async def apreload(request, menu_names):
+    """Async version of menu.cache.preload.
+
+    Menus are loaded in one thread call with two queries in total,
+    async ORM runs every query in the same thread anyway.
+    """
+    return await sync_to_async(cache.preload)(request, menu_names)
+
+
+class MenuPreloadMiddleware(object):
+    """Load menus from ``MENU_PRELOAD`` setting for every request.
+
+    Under ASGI menus are loaded in thread before view, so menu tags only
+    read loaded trees and make no blocking queries while template is
+    rendered.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.menu_names = list(getattr(settings, 'MENU_PRELOAD', ()))
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if self.menu_names:
+            cache.preload(request, self.menu_names)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if self.menu_names:
+            await apreload(request, self.menu_names)
+        return await self.get_response(request)
+
+
+class MenuReplicaMiddleware(object):
+    """Read menus from primary database for clients which changed them.
+
+    After request writing menus, client's menu reads go to primary for
+    ``MENU_PRIMARY_WINDOW`` seconds, kept in cookie, so editors do not
+    see menus of lagging replica. Used with menu.routers.MenuRouter.
+    """
+
+    cookie_name = 'menu_primary'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            until = float(request.COOKIES.get(self.cookie_name, 0))
+        except ValueError:
+            until = 0
+        routers.start_request(pinned=until > time.time())
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = routers.finish_request()
+        if wrote:
+            window = routers.get_window()
+            response.set_cookie(self.cookie_name,
+                                '{:.0f}'.format(time.time() + window),
+                                max_age=window, httponly=True)
+        return response
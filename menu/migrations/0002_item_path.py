@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def fill_paths(apps, schema_editor):
+    Item = apps.get_model('menu', 'Item')
+    db_alias = schema_editor.connection.alias
+    items = Item.objects.using(db_alias).order_by('id') \
+        .values_list('id', 'parent_id')
+    parents = dict(items)
+
+    paths = dict()
+    for item_id in parents:
+        branch = []
+        current = item_id
+        while current is not None and current not in paths \
+                and current not in branch:
+            branch.append(current)
+            current = parents.get(current)
+        path = paths.get(current, '')
+        for i in reversed(branch):
+            path = paths[i] = '{}{}/'.format(path, i)
+
+    for item_id, path in paths.items():
+        Item.objects.using(db_alias).filter(pk=item_id).update(path=path)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='path',
+            field=models.CharField(db_index=True, default='', editable=False, help_text='Ids from root to item, like "1/2/3/"', max_length=255),
+        ),
+        migrations.RunPython(fill_paths, migrations.RunPython.noop),
+    ]
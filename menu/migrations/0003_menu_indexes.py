@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def rename_duplicates(apps, schema_editor):
+    Menu = apps.get_model('menu', 'Menu')
+    db_alias = schema_editor.connection.alias
+    names = set()
+    for menu in Menu.objects.using(db_alias).order_by('id'):
+        if menu.name in names:
+            menu.name = '{} ({})'.format(menu.name, menu.id)[:80]
+            menu.save(update_fields=['name'])
+        names.add(menu.name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0002_item_path'),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_duplicates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='menu',
+            name='name',
+            field=models.CharField(help_text='For template', max_length=80, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='menu',
+            name='depth',
+            field=models.IntegerField(default=3, help_text='Maximum nesting level, used for orm tag only'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['menu', 'parent', 'order'], name='menu_item_tree_idx'),
+        ),
+    ]
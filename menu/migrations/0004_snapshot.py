@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0003_menu_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Snapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField()),
+                ('data', models.TextField(help_text='Items as compact JSON')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('menu', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='menu.Menu')),
+            ],
+            options={
+                'verbose_name': 'menu snapshot',
+                'verbose_name_plural': 'menu snapshots',
+                'unique_together': {('menu', 'version')},
+            },
+        ),
+        migrations.AddField(
+            model_name='menu',
+            name='published',
+            field=models.ForeignKey(blank=True, editable=False, help_text='Snapshot drawn with MENU_SNAPSHOTS', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='menu.Snapshot'),
+        ),
+    ]
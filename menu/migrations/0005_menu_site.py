@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0004_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menu',
+            name='site_id',
+            field=models.PositiveIntegerField(blank=True, help_text='Id of django.contrib.sites Site, empty for all sites', null=True),
+        ),
+        migrations.AlterField(
+            model_name='menu',
+            name='name',
+            field=models.CharField(help_text='For template', max_length=80),
+        ),
+        migrations.AlterUniqueTogether(
+            name='menu',
+            unique_together={('name', 'site_id')},
+        ),
+    ]
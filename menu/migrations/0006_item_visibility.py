@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0005_menu_site'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='visibility',
+            field=models.CharField(blank=True, choices=[('', 'Everyone'), ('authenticated', 'Logged in users'), ('anonymous', 'Anonymous users'), ('staff', 'Staff')], default='', help_text='Who sees item and its children', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='permission',
+            field=models.CharField(blank=True, default='', help_text='Permission required to see item and its children, like "app_label.codename"', max_length=100),
+        ),
+    ]
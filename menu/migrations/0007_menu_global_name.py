@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0006_item_visibility'),
+    ]
+
+    operations = []
+
+    # Conditional constraints need Django 2.2+
+    if hasattr(models, 'UniqueConstraint'):
+        operations.append(migrations.AddConstraint(
+            model_name='menu',
+            constraint=models.UniqueConstraint(condition=models.Q(site_id__isnull=True), fields=('name',), name='menu_menu_global_name_uniq'),
+        ))
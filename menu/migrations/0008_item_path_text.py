@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0007_menu_global_name'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='item',
+            name='path',
+            field=models.TextField(db_index=True, default='', editable=False, help_text='Ids from root to item, like "1/2/3/"'),
+        ),
+    ]
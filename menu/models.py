@@ -1,7 +1,18 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import json
+
+from django.db import connections
 from django.db import models
+from django.db import router
+from django.db import transaction
+from django.db.models import Case
+from django.db.models import Max
+from django.db.models import Value
+from django.db.models import When
+from django.db.models.functions import Concat
+from django.db.models.functions import Substr
 from django.urls import reverse
 from django.urls import resolve
 from django.core.validators import URLValidator
@@ -10,21 +21,225 @@ from django.urls.exceptions import Resolver404
 from django.urls.exceptions import NoReverseMatch
 
 
+def validate_url(url):
+    """Check item's URL, raise ValidationError for bad one."""
+    if '/' not in url:  # for named URL
+        try:
+            reverse(url)
+        except NoReverseMatch:
+            raise ValidationError('Bad URL')
+
+    elif url.startswith('/'):  # for raw internal URL
+        try:
+            resolve(url)
+        except Resolver404:
+            raise ValidationError('Bad URL')
+
+    else:  # for raw external URL
+        validate = URLValidator()
+        validate(url)
+
+
 class Menu(models.Model):
     ''' Menu '''
     name = models.CharField(max_length=80, help_text='For template')
+    site_id = models.PositiveIntegerField(null=True, blank=True,
+                                          help_text='Id of django.contrib.sites Site, empty for all sites')
     depth = models.IntegerField(default=3, help_text='Maximum nesting level, used for orm tag only')
+    published = models.ForeignKey('Snapshot',
+                                  on_delete=models.SET_NULL,
+                                  related_name='+',
+                                  null=True,
+                                  blank=True,
+                                  editable=False,
+                                  help_text='Snapshot drawn with MENU_SNAPSHOTS')
 
     class Meta:
         verbose_name = 'menu'
         verbose_name_plural = 'menus'
+        # Name goes first, so lookups by name only use the index too
+        unique_together = (('name', 'site_id'))
+        # Database does not compare NULL sites, so global names get own
+        # index where conditional constraints exist (Django 2.2+)
+        if hasattr(models, 'UniqueConstraint'):
+            constraints = [
+                models.UniqueConstraint(
+                    fields=['name'], condition=models.Q(site_id__isnull=True),
+                    name='menu_menu_global_name_uniq'),
+            ]
+
+    def validate_unique(self, exclude=None):
+        super(Menu, self).validate_unique(exclude)
+        # Database does not compare NULL sites
+        if self.site_id is None and Menu.objects.filter(
+                name=self.name, site_id__isnull=True) \
+                .exclude(pk=self.pk).exists():
+            raise ValidationError({'name': 'Menu with this name exists'})
 
     def __unicode__(self):
         return self.name
 
+    def move_items(self, moves):
+        """Change parents and order of several items at once.
+
+        All changes are written with one UPDATE, then menu cache is
+        dropped once.
+
+        Parameters
+        ----------
+        moves : list
+            Tuples (item id, new parent id or None, new order).
+
+        Raises
+        ------
+        ValidationError
+            For items of other menus and parent cycles.
+        """
+        if not moves:
+            return
+        # Items are validated on primary, replica may lag behind
+        using = router.db_for_write(Item)
+        items = Item.objects.using(using)
+        with transaction.atomic(using=using):
+            parents = dict(items.filter(menu=self)
+                           .values_list('id', 'parent_id'))
+            orders = dict()
+            for item_id, parent_id, order in moves:
+                if item_id not in parents:
+                    raise ValidationError('Item {} not found'.format(item_id))
+                if parent_id is not None and parent_id not in parents:
+                    raise ValidationError('Bad parent {}'.format(parent_id))
+                if order is None or int(order) < 0:
+                    raise ValidationError('Bad order {}'.format(order))
+                parents[item_id] = parent_id
+                orders[item_id] = int(order)
+
+            for item_id in orders:
+                seen = set()
+                while item_id is not None:
+                    if item_id in seen:
+                        raise ValidationError('Parent cycle')
+                    seen.add(item_id)
+                    item_id = parents[item_id]
+
+            ids = list(orders)
+            # Chunks keep query parameters under database limits
+            for i in range(0, len(ids), 300):
+                chunk = ids[i:i + 300]
+                items.filter(menu=self, pk__in=chunk).update(
+                    parent_id=Case(*[When(pk=pk, then=Value(parents[pk]))
+                                     for pk in chunk],
+                                   output_field=models.IntegerField()),
+                    order=Case(*[When(pk=pk, then=Value(orders[pk]))
+                                 for pk in chunk],
+                               output_field=models.IntegerField()))
+            Item.rebuild_paths(self.id)
+
+            transaction.on_commit(self.changed, using=using)
+
+    def publish(self):
+        """Save current items as new snapshot and publish it.
+
+        Returns
+        -------
+        Snapshot
+            New published snapshot.
+        """
+        using = router.db_for_write(Snapshot)
+        with transaction.atomic(using=using):
+            # Lock menu row, so concurrent publishes get different versions
+            list(Menu.objects.using(using).select_for_update()
+                 .filter(pk=self.pk).values_list('pk'))
+            # Items are read on primary, replica may lag behind
+            items = Item.objects.using(using).filter(menu=self) \
+                .order_by('path', 'id') \
+                .values_list(*Snapshot.FIELDS + Item.RULE_FIELDS)
+            data = {'items': [], 'rules': []}
+            size = len(Snapshot.FIELDS)
+            for item in items:
+                data['items'].append(item[:size])
+                if any(item[size:]):
+                    data['rules'].append((item[0],) + item[size:])
+            if not data['rules']:
+                del data['rules']
+            data = json.dumps(data, separators=(',', ':'))
+            snapshots = Snapshot.objects.using(using).filter(menu=self)
+            version = snapshots.aggregate(
+                version=Max('version'))['version'] or 0
+            snapshot = snapshots.create(
+                menu=self, version=version + 1, data=data)
+            self.set_published(snapshot)
+        return snapshot
+
+    def rollback(self, version):
+        """Publish earlier snapshot with given version."""
+        using = router.db_for_write(Snapshot)
+        self.set_published(Snapshot.objects.using(using)
+                           .get(menu=self, version=version))
+
+    def set_published(self, snapshot):
+        """Switch drawn snapshot, None draws current items."""
+        # Update skips post_save, cache is dropped once after commit
+        using = router.db_for_write(Menu)
+        Menu.objects.using(using).filter(pk=self.pk) \
+            .update(published=snapshot)
+        self.published = snapshot
+        transaction.on_commit(self.changed, using=using)
+
+    def changed(self):
+        """Drop cached trees and rendered menus after changes without signals."""
+        from menu import cache
+        from menu.tree import get_menu_key
+
+        cache.menu_changed(get_menu_key(self.site_id, self.name), self.id)
+
+
+class Snapshot(models.Model):
+    ''' Published menu items '''
+    # Item fields saved for every item, menu_id is the snapshot's menu
+    FIELDS = ('id', 'parent_id', 'name', 'url', 'order')
+
+    menu = models.ForeignKey('Menu',
+                             on_delete=models.CASCADE,
+                             related_name='snapshots')
+    version = models.PositiveIntegerField()
+    data = models.TextField(help_text='Items as compact JSON')
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'menu snapshot'
+        verbose_name_plural = 'menu snapshots'
+        unique_together = (('menu', 'version'))
+
+    def __unicode__(self):
+        return '{} v{}'.format(self.menu_id, self.version)
+
+    def get_items(self):
+        """Return items as tuples of Snapshot.FIELDS values."""
+        return self.get_data()['items']
+
+    def get_rules(self):
+        """Return (id, visibility, permission) of items with rules."""
+        return self.get_data().get('rules', [])
+
+    def get_data(self):
+        """Return parsed data, parsed once per instance."""
+        if getattr(self, '_parsed', None) is None:
+            self._parsed = json.loads(self.data)
+        return self._parsed
+
 
 class Item(models.Model):
     ''' Menu Item '''
+    VISIBILITY_CHOICES = (
+        ('', 'Everyone'),
+        ('authenticated', 'Logged in users'),
+        ('anonymous', 'Anonymous users'),
+        ('staff', 'Staff'),
+    )
+    # Visibility rules of item, applied to its descendants too
+    RULE_FIELDS = ('visibility', 'permission')
+
     menu = models.ForeignKey('Menu',
                              on_delete=models.CASCADE)
     name = models.CharField(max_length=80)
@@ -35,11 +250,26 @@ class Item(models.Model):
                                blank=True)
     order = models.PositiveIntegerField(default=0)
     url = models.CharField(max_length=100, default='', blank=True)
+    visibility = models.CharField(max_length=16, default='', blank=True,
+                                  choices=VISIBILITY_CHOICES,
+                                  help_text='Who sees item and its children')
+    permission = models.CharField(max_length=100, default='', blank=True,
+                                  help_text='Permission required to see item and its children, like "app_label.codename"')
+    # Unlimited, so menus of any depth are stored. PostgreSQL indexes it
+    # with text_pattern_ops too, so prefix lookups use index under any
+    # collation
+    path = models.TextField(default='', editable=False, db_index=True,
+                            help_text='Ids from root to item, like "1/2/3/"')
 
     class Meta:
         verbose_name = 'menu item'
         verbose_name_plural = 'menu items'
         unique_together = (('menu', 'url'))
+        # Items of menu by parent in menu order, as tags read them
+        indexes = [
+            models.Index(fields=['menu', 'parent', 'order'],
+                         name='menu_item_tree_idx'),
+        ]
 
     def __unicode__(self):
         return u'{} - {}'.format(self.menu.name, self.name)
@@ -52,20 +282,84 @@ class Item(models.Model):
                 raise ValidationError('Parent is equal to itself')
             if self.menu != self.parent.menu:
                 raise ValidationError('Bad parent')
+            if self.path and self.parent.path.startswith(self.path):
+                raise ValidationError('Parent is a child of item')
+
+        if self.permission and '.' not in self.permission:
+            raise ValidationError({'permission': 'Use "app_label.codename"'})
+
+        validate_url(self.url)
+
+    def save(self, *args, **kwargs):
+        """Save item and keep paths of item and its descendants."""
+        # Transaction is on database of writes, which router pins reads to
+        using = kwargs.get('using') or router.db_for_write(Item, instance=self)
+        items = Item.objects.using(using)
+        with transaction.atomic(using=using):
+            # Path in memory may be outdated by parent's move, stored
+            # menu is kept for signals to drop menu item moved from
+            if self.pk:
+                self.path, self._stored_menu_id = items \
+                    .filter(pk=self.pk) \
+                    .values_list('path', 'menu_id').first() or ('', None)
+            super(Item, self).save(*args, **kwargs)
+
+            parent_path = ''
+            if self.parent_id:
+                parent_path = items.filter(pk=self.parent_id) \
+                    .values_list('path', flat=True).first() or ''
+            path = '{}{}/'.format(parent_path, self.pk)
+            if path == self.path:
+                return
+
+            items.filter(pk=self.pk).update(path=path)
+            if self.path:
+                # Replace old path prefix of moved descendants
+                items.filter(path__startswith=self.path) \
+                    .exclude(pk=self.pk) \
+                    .update(path=Concat(Value(path),
+                                        Substr('path', len(self.path) + 1)))
+            self.path = path
+
+    @classmethod
+    def rebuild_paths(cls, menu_id=None):
+        """Set paths for items saved without save(), as by bulk_create."""
+        using = router.db_for_write(cls)
+        items = cls.objects.using(using)
+        if menu_id is not None:
+            items = items.filter(menu_id=menu_id)
+        items = list(items.values_list('id', 'parent_id', 'path'))
+        parents = dict((i[0], i[1]) for i in items)
+
+        paths = dict()
+
+        def get_path(item_id):
+            branch = []
+            while item_id is not None and item_id not in paths \
+                    and item_id not in branch:
+                branch.append(item_id)
+                item_id = parents.get(item_id)
+            path = paths.get(item_id, '')
+            for i in reversed(branch):
+                path = paths[i] = '{}{}/'.format(path, i)
+            return path
+
+        changed = []
+        for item_id, parent_id, path in items:
+            new_path = get_path(item_id)
+            if new_path != path:
+                changed.append((new_path, item_id))
+
+        if not changed:
+            return
 
-        # check correct URL
-        if '/' not in self.url:  # for named URL
-            try:
-                reverse(self.url)
-            except NoReverseMatch:
-                raise ValidationError('Bad URL')
-
-        elif self.url.startswith('/'):  # for raw internal URL
-            try:
-                resolve(self.url)
-            except Resolver404:
-                raise ValidationError('Bad URL')
-
-        else:  # for raw external URL
-            validate = URLValidator()
-            validate(self.url)
+        # One prepared statement for all rows, much faster than
+        # update() per item
+        connection = connections[using]
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            cursor.executemany(
+                'UPDATE {} SET {} = %s WHERE {} = %s'.format(
+                    connection.ops.quote_name(cls._meta.db_table),
+                    connection.ops.quote_name('path'),
+                    connection.ops.quote_name(cls._meta.pk.column)),
+                changed)
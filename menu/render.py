@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""Menu HTML built without template engine.
+
+Output is the same as of 'menu/menu.html' template shipped with the
+app, so overridden templates are not used by this renderer.
+"""
+from __future__ import unicode_literals
+
+from django.utils.html import conditional_escape
+from django.utils.safestring import mark_safe
+
+
+def _no_escape(value):
+    return '{}'.format(value)
+
+
+def render_html(data, autoescape=True):
+    """Render menu tag context like 'menu/menu.html' does.
+
+    Parameters
+    ----------
+    data : dict
+        Menu context with 'menu_name' and 'levels', or None.
+    autoescape : bool
+        Escape values, as template context's ``autoescape``.
+
+    Returns
+    -------
+    str
+        Safe HTML.
+    """
+    escape = conditional_escape if autoescape else _no_escape
+    data = data or {}
+    parts = ['<div id="menu-', escape(data.get('menu_name', '')),
+             '" class="menu">\n']
+    for level in data.get('levels', ()):
+        parts.append('\n  <ul>\n  ')
+        for item in level:
+            css_class = item['class']
+            name = escape(item['name'])
+            parts.append('  \n    <li class="')
+            parts.append(escape(css_class))
+            try:
+                children_url = item['children_url']
+            except KeyError:
+                children_url = None
+            if children_url:
+                parts.append('" data-children="')
+                parts.append(escape(children_url))
+            if 'current' in css_class:
+                parts.append('">\n      \n        ')
+                parts.append(name)
+            else:
+                parts.append('">\n      \n        <a href="')
+                parts.append(escape(item['url']))
+                parts.append('">')
+                parts.append(name)
+                parts.append('</a>')
+            parts.append('\n      \n    </li>\n  ')
+        parts.append('\n  </ul>\n')
+    parts.append('\n</div>\n<div class=\'menu-clear\'></div>\n')
+    return mark_safe(''.join(parts))
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""Database router sending menu reads to read replica."""
+from __future__ import unicode_literals
+
+import time
+from contextlib import contextmanager
+try:
+    from asgiref.local import Local
+except ImportError:  # Django < 3.0
+    from threading import local as Local
+
+from django.conf import settings
+from django.db import connections
+
+
+# Request's state: reads pinned to primary and writes done
+_local = Local()
+# Time until which all menu reads of the process go to primary
+_pinned_until = [0.0]
+
+
+def get_primary():
+    """Return alias of primary database, ``MENU_PRIMARY_DB`` setting."""
+    return getattr(settings, 'MENU_PRIMARY_DB', 'default')
+
+
+def get_window():
+    """Return seconds reads stay on primary after menu changes."""
+    return getattr(settings, 'MENU_PRIMARY_WINDOW', 10)
+
+
+def pin_primary():
+    """Read menus of this process from primary for a while.
+
+    Called on menu changes seen by the process, so trees cached after
+    changes are not loaded from lagging replica.
+    """
+    _pinned_until[0] = time.time() + get_window()
+
+
+@contextmanager
+def use_primary():
+    """Read menus from primary inside the block."""
+    pinned = getattr(_local, 'pinned', False)
+    _local.pinned = True
+    try:
+        yield
+    finally:
+        _local.pinned = pinned
+
+
+def start_request(pinned=False):
+    """Reset request's state, reads go to primary when pinned."""
+    _local.pinned = pinned
+    _local.wrote = False
+
+
+def finish_request():
+    """Return True when request wrote menus, reset request's state."""
+    wrote = getattr(_local, 'wrote', None)
+    _local.pinned = False
+    _local.wrote = None
+    return bool(wrote)
+
+
+def is_pinned():
+    """Check if menus are read from primary now."""
+    return getattr(_local, 'pinned', False) or \
+        getattr(_local, 'wrote', False) or \
+        time.time() < _pinned_until[0] or \
+        connections[get_primary()].in_atomic_block
+
+
+class MenuRouter(object):
+    """Send reads of menu models to ``MENU_REPLICA_DB`` database.
+
+    Writes go to ``MENU_PRIMARY_DB``. Reads go to primary inside its
+    transactions, after writes in the same request, for clients which
+    wrote menus recently (see menu.middleware.MenuReplicaMiddleware) and
+    for the process after menu changes, for ``MENU_PRIMARY_WINDOW``
+    seconds. Other models are left to other routers::
+
+        DATABASE_ROUTERS = ['menu.routers.MenuRouter']
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label != 'menu':
+            return None
+        # Related objects are read from database of their instance
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        replica = getattr(settings, 'MENU_REPLICA_DB', None)
+        if replica is None or is_pinned():
+            return get_primary()
+        return replica
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label != 'menu':
+            return None
+        # Writes are tracked inside requests only
+        if getattr(_local, 'wrote', None) is not None:
+            _local.wrote = True
+        return get_primary()
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if obj1._meta.app_label == 'menu' and \
+                obj2._meta.app_label == 'menu':
+            return True
+        return None
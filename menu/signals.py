@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""Cache invalidation on menu changes."""
+from __future__ import unicode_literals
+
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from menu import cache
+from menu.models import Item
+from menu.models import Menu
+from menu.models import Snapshot
+from menu.tree import get_menu_key
+
+
+def _pending(using=None):
+    """Return changes waiting for commit of current transaction, or None."""
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block:
+        return None
+    state = getattr(connection, '_menu_pending', None)
+    # Rolled back transaction drops its callback together with state
+    if state is None or not any(entry[1] is state['flush']
+                                for entry in connection.run_on_commit):
+        state = {'changed': {}, 'keys': {}}
+
+        def flush():
+            connection._menu_pending = None
+            for menu_name, menu_id in state['changed']:
+                cache.menu_changed(menu_name, menu_id)
+
+        state['flush'] = flush
+        connection._menu_pending = state
+        transaction.on_commit(flush, using=using)
+    return state
+
+
+def _invalidate(menu_name, menu_id=None, using=None):
+    state = _pending(using)
+    if state is None:
+        cache.menu_changed(menu_name, menu_id)
+        return
+    # Drop cache now and once more after commit, so trees loaded
+    # by other threads before commit are not kept. Shared version is
+    # bumped again only if read since, so deleting many items does not
+    # write the shared cache for each of them.
+    reads = cache.get_version_reads()
+    if state['changed'].get((menu_name, menu_id)) == reads:
+        cache.invalidate(menu_id)
+    else:
+        state['changed'][(menu_name, menu_id)] = reads
+        cache.menu_changed(menu_name, menu_id)
+
+
+def _menu_key(menu_id, using=None):
+    state = _pending(using)
+    keys = state['keys'] if state is not None else {}
+    if menu_id not in keys:
+        menu = Menu.objects.using(using).filter(pk=menu_id) \
+            .values_list('site_id', 'name').first()
+        keys[menu_id] = get_menu_key(*menu) if menu else None
+    return keys[menu_id]
+
+
+@receiver(post_save, sender=Menu)
+@receiver(post_delete, sender=Menu)
+def menu_changed(sender, instance, using=None, **kwargs):
+    state = _pending(using)
+    if state is not None:
+        state['keys'].pop(instance.pk, None)
+    # Menu may be renamed, so unknown names may become known
+    _invalidate(get_menu_key(instance.site_id, instance.name), using=using)
+
+
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+def item_changed(sender, instance, using=None, **kwargs):
+    _invalidate(_menu_key(instance.menu_id, using), instance.menu_id,
+                using=using)
+    # Item moved to another menu leaves the old one too
+    stored_menu_id = getattr(instance, '_stored_menu_id', None)
+    if stored_menu_id not in (None, instance.menu_id):
+        _invalidate(_menu_key(stored_menu_id, using), stored_menu_id,
+                    using=using)
+
+
+@receiver(post_delete, sender=Snapshot)
+def snapshot_deleted(sender, instance, using=None, **kwargs):
+    # Menu drawing the snapshot is switched to items without signal
+    _invalidate(_menu_key(instance.menu_id, using), instance.menu_id,
+                using=using)
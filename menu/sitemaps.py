@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""Sitemaps of menu items' URLs for large menus."""
+from __future__ import unicode_literals
+
+import django
+from django.contrib.sitemaps import Sitemap
+from django.utils.html import escape
+
+from menu.models import Item
+from menu.utils import reverse_url
+
+
+# Protocol limits of one sitemap file
+MAX_URLS = 50000
+MAX_BYTES = 50 * 1024 * 1024
+
+URLSET_HEADER = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                 '<urlset xmlns="http://www.sitemaps.org/schemas/'
+                 'sitemap/0.9">\n')
+URLSET_FOOTER = '</urlset>\n'
+INDEX_HEADER = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<sitemapindex xmlns="http://www.sitemaps.org/schemas/'
+                'sitemap/0.9">\n')
+INDEX_FOOTER = '</sitemapindex>\n'
+
+
+class MenuURLs(object):
+    """Distinct paths of menu items' internal URLs.
+
+    Paths of named URLs go first, they are few as URL names are. Raw
+    paths follow in database order, counted, sliced and deduplicated
+    by database and read in chunks, so memory does not depend on
+    number of items. External URLs and unknown names are skipped.
+
+    Parameters
+    ----------
+    menu_names : list, optional
+        Names of menus, all menus by default.
+    chunk_size : int
+        Rows fetched from database at once, on Django 2.0+.
+    """
+
+    def __init__(self, menu_names=None, chunk_size=2000):
+        items = Item.objects.all()
+        if menu_names:
+            items = items.filter(menu__name__in=menu_names)
+        named = items.exclude(url__contains='/').exclude(url='') \
+            .values_list('url', flat=True).distinct()
+        self.named = sorted(set(
+            href for href in map(reverse_url, named) if href != '#'))
+        self.paths = items.filter(url__startswith='/') \
+            .exclude(url__in=self.named) \
+            .values_list('url', flat=True).distinct().order_by('url')
+        self.chunk_size = chunk_size
+
+    def __len__(self):
+        return len(self.named) + self.paths.count()
+
+    def __iter__(self):
+        return self.iterate()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step is not None:
+            raise TypeError('Only slices without step are supported')
+        return list(self.iterate(index.start or 0, index.stop))
+
+    def iterate(self, start=0, stop=None):
+        """Yield paths from start to stop position."""
+        for path in self.named[start:stop]:
+            yield path
+        count = len(self.named)
+        start = max(start - count, 0)
+        if stop is not None:
+            stop = max(stop - count, 0)
+            if stop <= start:
+                return
+        paths = self.paths[start:stop]
+        if django.VERSION >= (2, 0):
+            paths = paths.iterator(chunk_size=self.chunk_size)
+        else:  # Django < 2.0 has no chunk_size
+            paths = paths.iterator()
+        for path in paths:
+            yield path
+
+
+class MenuSitemap(Sitemap):
+    """django.contrib.sitemaps Sitemap of menu items' URLs::
+
+        sitemaps = {'menu': MenuSitemap(['main', 'footer'])}
+
+    Pages are sliced in database, see MenuURLs.
+    """
+
+    def __init__(self, menu_names=None):
+        self.menu_names = menu_names
+
+    def items(self):
+        return MenuURLs(self.menu_names)
+
+    def location(self, path):
+        return path
+
+
+def urlset(base_url, paths):
+    """Yield sitemap XML of paths by line."""
+    yield URLSET_HEADER
+    for path in paths:
+        yield url_entry(base_url, path)
+    yield URLSET_FOOTER
+
+
+def sitemap_index(locations):
+    """Yield sitemap index XML of sitemap locations by line."""
+    yield INDEX_HEADER
+    for location in locations:
+        yield '<sitemap><loc>{}</loc></sitemap>\n'.format(escape(location))
+    yield INDEX_FOOTER
+
+
+def url_entry(base_url, path):
+    """Return <url> element of path."""
+    return '<url><loc>{}</loc></url>\n'.format(escape(base_url + path))
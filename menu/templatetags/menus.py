@@ -7,22 +7,236 @@ try:
     logging = settings.LOGGER
 except AttributeError:
     import logging
+import timeit
 from itertools import groupby
 
 from django import template
-from django.urls import reverse, resolve
+from django.db import connections
+from django.db import router
+from django.db.models import Exists
+from django.db.models import OuterRef
 from django.db.models import Q
+from django.utils.safestring import mark_safe
 
-from django.urls.exceptions import NoReverseMatch
-
+from menu import cache
+from menu import instrumentation
 from menu.models import Item
 from menu.models import Menu
+from menu.render import render_html
+from menu.tree import ITEM_FIELDS
+from menu.tree import MenuItem
+from menu.tree import MenuTree
+from menu.tree import split_rules
+from menu.utils import children_url_prefix
+from menu.utils import get_current_url
+from menu.utils import reverse_url
 
 
 register = template.Library()
 
+# Names of tags registered with menu_tag
+menu_tags = []
+
+
+def menu_tag(func):
+    """Register function returning menu context as menu drawing tag.
+
+    Tag renders 'menu/menu.html' like inclusion tag does, and optionally
+    stores rendered menu in Django cache (see ``MENU_CACHE`` setting and
+    tag's ``cache`` argument). With 'python' renderer (see
+    ``MENU_RENDERER`` setting and tag's ``renderer`` argument) the same
+    HTML is built by menu.render without template engine::
+
+        {% draw_sql_menu 'main' cache=True renderer='python' %}
+
+    Decorated function is returned as is.
+    """
+    def tag(context, menu_name, cache=None, renderer=None):
+        return render_menu(context, func, menu_name, cache, renderer)
+
+    tag.__doc__ = func.__doc__
+    register.simple_tag(tag, takes_context=True, name=func.__name__)
+    menu_tags.append(func.__name__)
+    return func
+
+
+def render_menu(context, func, menu_name, use_cache=None, renderer=None):
+    """Render menu template, use rendered menu from cache if enabled."""
+    stats = instrumentation.start(func.__name__, menu_name)
+    if stats is None:
+        return _render_menu(context, func, menu_name, use_cache, renderer)
+
+    start = timeit.default_timer()
+    connection = connections[router.db_for_read(Item)]
+    try:
+        if hasattr(connection, 'execute_wrapper'):
+            with connection.execute_wrapper(stats.execute_wrapper):
+                return _render_menu(context, func, menu_name, use_cache,
+                                    renderer, stats)
+        return _render_menu(context, func, menu_name, use_cache, renderer,
+                            stats)
+    finally:
+        stats.total_time = timeit.default_timer() - start
+        instrumentation.finish(stats, sender=func)
+
+
+def _render_menu(context, func, menu_name, use_cache, renderer,
+                 stats=None):
+    if use_cache is None:
+        use_cache = getattr(settings, 'MENU_CACHE', False)
+    if renderer is None:
+        renderer = getattr(settings, 'MENU_RENDERER', 'template')
+
+    key = None
+    request = context['request']
+    if stats is not None and cache.has_tree(request, menu_name):
+        stats.tree_cache = 'hit'
+    if use_cache and getattr(settings, 'MENU_TREE_CACHE', True):
+        tree = cache.get_request_tree(request, menu_name)
+        if tree is not None:
+            item_id = tree.find_current(*get_current_url(request))
+            # Renderers and escaping give different HTML of one menu
+            variant = (func.__name__, renderer, context.autoescape)
+            key = cache.fragment_key(tree, variant, item_id)
+            html = cache.get_backend().get(key)
+            if stats is not None:
+                stats.fragment_cache = 'miss' if html is None else 'hit'
+            if html is not None:
+                return mark_safe(html)
+
+    if stats is None:
+        data = func(context, menu_name)
+    else:
+        start = timeit.default_timer()
+        data = func(context, menu_name)
+        stats.build_time = timeit.default_timer() - start
+        if data:
+            stats.items = sum(len(level) for level in data['levels'])
+        start = timeit.default_timer()
+    if data:
+        # Breadcrumbs drawn later use drawn branch without queries
+        cache.set_ancestry(request, menu_name, [
+            item for level in data['levels'] for item in level
+            if item.css_class.split()[0] in ('selected', 'current')])
+
+    if renderer == 'python':
+        html = render_html(data, context.autoescape)
+    else:
+        t = context.template.engine.get_template('menu/menu.html')
+        html = t.render(context.new(data))
+
+    if stats is not None:
+        stats.render_time = timeit.default_timer() - start
+
+    if key is not None:
+        timeout = getattr(settings, 'MENU_CACHE_TIMEOUT', None)
+        if timeout is None:
+            cache.get_backend().set(key, html)
+        else:
+            cache.get_backend().set(key, html, timeout)
+    return html
+
+
+def draw_cached_menu(request, menu_name, current_path, current_url_name,
+                     depth=False):
+    """Build menu levels from cached menu tree without database queries.
+
+    Parameters
+    ----------
+    request : django.http.HttpRequest
+        Current request with trees preloaded by load_menus tag.
+    menu_name : str
+        Menu's name (menu.models.Menu.name).
+    current_path : str
+        Current request path.
+    current_url_name : str
+        URL name resolved from current path.
+    depth : bool
+        Limit nesting level with menu's depth like orm tag does.
+
+    Returns
+    -------
+    dict
+        Context for menu template.
+    """
+    tree = cache.get_request_tree(request, menu_name)
+    if tree is None:
+        logging.error('Menu with name "{}" not found'.format(menu_name))
+        return {'levels': [], 'menu_name': menu_name}
+
+    levels = tree.get_levels(current_path,
+                             current_url_name,
+                             depth=tree.depth if depth else None)
+    if not levels:
+        logging.error('menu with name "{}" is empty'.format(menu_name))
+    return {'levels': levels, 'menu_name': menu_name}
+
+
+@register.simple_tag(takes_context=True)
+def load_menus(context, *menu_names):
+    """Tag for loading several menus with one query.
+
+    Later menu tags for these menus use loaded trees::
+
+        {% load_menus 'main' 'footer' 'side' %}
+        ...
+        {% draw_sql_menu 'footer' %}
+
+    Parameters
+    ----------
+    menu_names : str
+        Menus' names (menu.models.Menu.name).
+
+    Returns
+    -------
+    str
+        Empty string.
+    """
+    cache.preload(context['request'], menu_names)
+    return ''
+
+
+@register.simple_tag(takes_context=True)
+def get_breadcrumbs(context, menu_name):
+    """Tag for getting items from root to current item into variable.
+
+    Items are the branch drawn by menu tag of the same menu, so drawing
+    both costs no more queries than the menu alone::
+
+        {% get_breadcrumbs 'main' as breadcrumbs %}
+
+    Parameters
+    ----------
+    menu_name : str
+        Menu's name (menu.models.Menu.name).
+
+    Returns
+    -------
+    list
+        MenuItem with 'selected' class, and 'current' for the last one.
+    """
+    return cache.get_ancestry(context['request'], menu_name)
+
 
-@register.inclusion_tag('menu/menu.html', takes_context=True)
+@register.inclusion_tag('menu/breadcrumbs.html', takes_context=True)
+def draw_breadcrumbs(context, menu_name):
+    """Tag for breadcrumbs drawing, see get_breadcrumbs.
+
+    Parameters
+    ----------
+    menu_name : str
+        Menu's name (menu.models.Menu.name).
+
+    Returns
+    -------
+    dict
+        Context for breadcrumbs template with 'items' and 'menu_name'.
+    """
+    return {'items': cache.get_ancestry(context['request'], menu_name),
+            'menu_name': menu_name}
+
+
+@menu_tag
 def draw_sql_menu(context, menu_name):
     """Tag for menu drawing with SQL.
 
@@ -37,99 +251,49 @@ def draw_sql_menu(context, menu_name):
         Example:
             {
              # Menu name
-             'menu_name': 'name',
-
-             # Menu items
-             {'levels': [
-                         # Root level
-                         [{'name': 'Index',
-                           'parent_id': None,
-                           'url': '/',
-                           'class': 'selected',
-                           'id': 1,
-                           'menu_id': 1,
-                           'order': 0,
-                           'level': -2,
-                           '_state': <django.db.models.base.ModelState object at 0x7f59f26741d0>},
-                          {'name': 'Another Root Item',
-                           'parent_id': None,
-                           'url': '/another_root',
-                           'class': 'root',
-                           'id': 6,
-                           'menu_id': 1,
-                           'order': 0,
-                           'level': -2,
-                           '_state': <django.db.models.base.ModelState object at 0x7f59f26747b8>},
-                          {'name': 'Another Root Item2',
-                           'parent_id': None,
-                           'url': '/another_root_2',
-                           'class': 'root',
-                           'id': 7,
-                           'menu_id': 1,
-                           'order': 0,
-                           'level': -2,
-                           '_state': <django.db.models.base.ModelState object at 0x7f59f2674a58>}],
-                         # 2 level
-                         [{'name': 'I2',
-                           'parent_id': 1,
-                           'url': '/i2',
-                           'class': 'selected',
-                           'id': 2,
-                           'menu_id': 1,
-                           'order': 0,
-                           'level': -1,
-                           '_state': <django.db.models.base.ModelState object at 0x7f59f26749b0>},
-                          {'name': 'I22',
-                           'parent_id': 1,
-                           'url': '/i22',
-                           'class': 'neighbour',
-                           'id': 22,
-                           'menu_id': 1,
-                           'order': 0,
-                           'level': -1,
-                           '_state': <django.db.models.base.ModelState object at 0x7f59f26748d0>}],
-                         # Current level
-                         [{'name': 'I3',
-                           'parent_id': 2,
-                           'url': '/i3',
-                           'class': 'current',
-                           'id': 3,
-                           'menu_id': 1,
-                           'order': 0,
-                           'level': 0,
-                           '_state': <django.db.models.base.ModelState object at 0x7f59f26749e8>},
-                          {'name': 'I32',
-                           'parent_id': 2,
-                           'url': '/i32',
-                           'class': 'neighbour',
-                           'id': 32,
-                           'menu_id': 1,
-                           'order': 0,
-                           'level': 0,
-                           '_state': <django.db.models.base.ModelState object at 0x7f59f2674f98>}],
-                         # Child level
-                         [{'name': 'I4',
-                           'parent_id': 3,
-                           'url': '/i4',
-                           'class': 'child',
-                           'id': 4,
-                           'menu_id': 1,
-                           'order': 0,
-                           'level': 1,
-                           '_state': <django.db.models.base.ModelState object at 0x7f59f2674c88>},
-                          {'name': 'I41',
-                           'parent_id': 3,
-                           'url': '/i41',
-                           'class': 'child',
-                           'id': 41,
-                           'menu_id': 1,
-                           'order': 0,
-                           'level': 1,
-                           '_state': <django.db.models.base.ModelState object at 0x7f59f2674cc0>}]]}
+             'menu_name': 'main',
+
+             # Menu items, nodes are shared by requests
+             'levels': [
+                        # Root level
+                        [MenuItem(Node(id=1, menu_id=1, parent_id=None,
+                                       name='Index', url='index', order=0),
+                                  url='/', class='selected'),
+                         MenuItem(Node(id=6, menu_id=1, parent_id=None,
+                                       name='Another Root Item',
+                                       url='/another_root', order=0),
+                                  url='/another_root', class='root')],
+                        # 2 level
+                        [MenuItem(Node(id=2, menu_id=1, parent_id=1,
+                                       name='I2', url='/i2', order=0),
+                                  url='/i2', class='selected'),
+                         MenuItem(Node(id=22, menu_id=1, parent_id=1,
+                                       name='I22', url='/i22', order=0),
+                                  url='/i22', class='neighbour')],
+                        # Current level
+                        [MenuItem(Node(id=3, menu_id=1, parent_id=2,
+                                       name='I3', url='/i3', order=0),
+                                  url='/i3', class='current'),
+                         MenuItem(Node(id=32, menu_id=1, parent_id=2,
+                                       name='I32', url='/i32', order=0),
+                                  url='/i32', class='neighbour')],
+                        # Child level
+                        [MenuItem(Node(id=4, menu_id=1, parent_id=3,
+                                       name='I4', url='/i4', order=0),
+                                  url='/i4', class='child'),
+                         MenuItem(Node(id=41, menu_id=1, parent_id=3,
+                                       name='I41', url='i41', order=0),
+                                  url='/i41', class='child')]]}
+
+            MenuItem fields are available as keys and attributes,
+            ``item['class']`` or ``item.name``.
     """
     request = context['request']
-    current_path = request.path_info
-    current_url_name = resolve(current_path).url_name
+    current_path, current_url_name = get_current_url(request)
+
+    if cache.has_tree(request, menu_name):
+        return draw_cached_menu(request, menu_name,
+                                current_path, current_url_name)
 
     sql_query = """
         --build tree items from selected item up to root
@@ -138,7 +302,7 @@ def draw_sql_menu(context, menu_name):
                   (SELECT menu_item.*, 0 AS level, CAST('current' AS text) AS class
                    FROM menu_item
                    INNER JOIN menu_menu ON menu_item.menu_id=menu_menu.id
-                   WHERE menu_menu.name=%s
+                   WHERE menu_menu.name=%s AND menu_menu.site_id IS NULL
                      AND (menu_item.url=%s
                           OR menu_item.url=%s)),
              menu_tree AS
@@ -162,7 +326,8 @@ def draw_sql_menu(context, menu_name):
             SELECT menu_item.*, (SELECT MIN(level) from menu_tree) AS level, 'root' AS class
                 FROM menu_item
                 INNER JOIN menu_menu ON menu_menu.id=menu_item.menu_id
-                WHERE menu_menu.name=%s AND menu_item.parent_id IS NULL
+                WHERE menu_menu.name=%s AND menu_menu.site_id IS NULL
+                    AND menu_item.parent_id IS NULL
                     AND menu_item.id NOT IN (SELECT id FROM menu_tree)
         --parent neighbours
         UNION
@@ -175,33 +340,39 @@ def draw_sql_menu(context, menu_name):
         """
 
     result_menu = []
-    items = Item.objects.raw(sql_query,
-                             params=[menu_name,
-                                     current_path,
-                                     current_url_name,
-                                     menu_name])
-
-    # RawQuerySet has no methods for non-empty check
-    try:
-        items = [i for i in items]
-    except TypeError:
-        pass
-    else:
-        for key, level in groupby(items, key=lambda x: x.level):
-            level_menu = []
-            for item in level:
-                if '/' not in item.url:
-                    try:
-                        item.url = reverse(item.url)
-                    except NoReverseMatch:
-                        item.url = '#'
-                level_menu.append(item.__dict__)
-            result_menu.append(level_menu)
-    finally:
-        return {'levels': result_menu, 'menu_name': menu_name}
+    with connections[router.db_for_read(Item)].cursor() as cursor:
+        cursor.execute(sql_query, [menu_name,
+                                   current_path,
+                                   current_url_name,
+                                   menu_name])
+        columns = [column[0] for column in cursor.description]
+        rows = cursor.fetchall()
+
+    # Rows have all item's columns, level and class
+    fields = [columns.index(field)
+              for field in ITEM_FIELDS + Item.RULE_FIELDS]
+    level_index = columns.index('level')
+    class_index = columns.index('class')
+    nodes, rules = split_rules([row[i] for i in fields] for row in rows)
+    if rules:
+        # Rows have ancestors of all drawn items, so levels are built
+        # again from tree pruned by visibility rules
+        levels = MenuTree(nodes, rules=rules) \
+            .for_user(getattr(request, 'user', None)) \
+            .get_levels(current_path, current_url_name)
+        return {'levels': levels, 'menu_name': menu_name}
+
+    for key, level in groupby(zip(rows, nodes),
+                              key=lambda x: x[0][level_index]):
+        level_menu = []
+        for row, node in level:
+            level_menu.append(
+                MenuItem(node, reverse_url(node.url), row[class_index]))
+        result_menu.append(level_menu)
+    return {'levels': result_menu, 'menu_name': menu_name}
 
 
-@register.inclusion_tag('menu/menu.html', takes_context=True)
+@menu_tag
 def draw_orm_menu(context, menu_name):
     """Tag for menu drawing with Django ORM only.
 
@@ -213,94 +384,24 @@ def draw_orm_menu(context, menu_name):
     Returns
     -------
     dict
-        Example:
-            {
-             # Menu name for id
-             u'menu_name': u'main',
-
-             # Menu items
-             u'levels': [
-                         # Root level
-                         [{'menu_id': 1,
-                           'name': u'Index',
-                           'url': u'/',
-                           'class': u'selected',
-                           'id': 1,
-                           'parent_id': None,
-                           'order': 0},
-                          {'menu_id': 1,
-                           'name': u'Another Root Item',
-                           'url': u'/another_root',
-                           'class': u'root',
-                           'id': 6,
-                           'parent_id': None,
-                           'order': 0},
-                          {'menu_id': 1,
-                           'name': 'Another Root Item2',
-                           'url': '/another_root_2',
-                           'class': 'root',
-                           'id': 7,
-                           'parent_id': None,
-                           'order': 0}],
-                         # 2 level
-                         [{'menu_id': 1,
-                           'name': 'I2',
-                           'url': '/i2',
-                           'class': 'selected',
-                           'id': 2,
-                           'parent_id': 1,
-                           'order': 0},
-                          {'menu_id': 1,
-                           'name': 'I22',
-                           'url': '/i22',
-                           'class': 'neighbour',
-                           'id': 22,
-                           'parent_id': 1,
-                           'order': 0}],
-                         # Current level
-                         [{'menu_id': 1,
-                           'name': 'I3',
-                           'url': '/i3',
-                           'class': 'current',
-                           'id': 3,
-                           'parent_id': 2,
-                           'order': 0},
-                          {'menu_id': 1,
-                           'name': 'I32',
-                           'url': '/i32',
-                           'class': 'neighbour',
-                           'id': 32,
-                           'parent_id': 2,
-                           'order': 0}],
-                         # Child level
-                         [{'menu_id': 1,
-                           'name': 'I4',
-                           'url': '/i4',
-                           'class': 'child',
-                           'id': 4,
-                           'parent_id': 3,
-                           'order': 0},
-                          {'menu_id': 1,
-                           'name': 'I41',
-                           'url': '/i41',
-                           'class': 'child',
-                           'id': 41,
-                           'parent_id': 3,
-                           'order': 0}]]}
+        Same as draw_sql_menu.
     """
     request = context['request']
-    current_path = request.path_info
-    current_url_name = resolve(current_path).url_name
+    current_path, current_url_name = get_current_url(request)
+
+    if cache.has_tree(request, menu_name):
+        return draw_cached_menu(request, menu_name,
+                                current_path, current_url_name, depth=True)
 
     try:
         # We need depth for query filter
         # If move depth to settings or hardcode it - get 1 query for draw_menu
-        menu = Menu.objects.get(name=menu_name)
+        menu = Menu.objects.get(name=menu_name, site_id__isnull=True)
     except Menu.DoesNotExist:
         logging.error('Menu with name "{}" not found'.format(menu_name))
         return None
 
-    menu_items = Item.objects.filter(menu__name=menu.name)
+    menu_items = Item.objects.filter(menu=menu)
     items = menu_items.filter(Q(url=current_url_name) | Q(url=current_path))
 
     i = 0
@@ -319,50 +420,147 @@ def draw_orm_menu(context, menu_name):
 
     # get from DB
     items = menu_items.filter(tree_filter).distinct() \
-        .order_by('parent_id', 'order').values()
+        .values_list(*ITEM_FIELDS + Item.RULE_FIELDS)
 
-    result_menu = []
-    if items:
-        # Group items by parent
-        menu_data = groupby(items, key=lambda x: x['parent_id'])
-
-        # save menu to dict for later using
-        dict_menu = dict()
-        for parent, menu_level in menu_data:
-            dict_menu[parent] = list(menu_level)
-
-        def get_children(node, item_class=None):
-            """Build result list for menu, check URLs, add classes."""
-            current_level = dict_menu.get(node)
-
-            for item in current_level:
-                if '/' not in item['url']:
-                    try:
-                        item['url'] = reverse(item['url'])
-                    except NoReverseMatch:
-                        item['url'] = '#'
-
-                if item_class:
-                    item['class'] = item_class
-                elif item['url'] == current_url_name or \
-                        item['url'] == current_path:
-                    item['class'] = 'current'
-                    # Get children if exist
-                    if dict_menu.get(item['id']):
-                        get_children(item['id'], item_class='child')
-                elif dict_menu.get(item['id']):
-                    item['class'] = 'selected'
-                    get_children(item['id'])
-                elif not item['parent_id']:
-                    item['class'] = 'root'
-                else:
-                    item['class'] = 'neighbour'
-
-            result_menu.append(current_level)
-
-        get_children(None)
-        result_menu.reverse()
-    else:
+    nodes, rules = split_rules(items)
+    result_menu = MenuTree(nodes, menu, rules) \
+        .for_user(getattr(request, 'user', None)) \
+        .get_levels(current_path, current_url_name, depth=menu.depth)
+    if not result_menu:
         logging.error('menu with name "{}" is empty'.format(menu_name))
 
     return {'levels': result_menu, 'menu_name': menu_name}
+
+
+@menu_tag
+def draw_path_menu(context, menu_name):
+    """Tag for menu drawing with materialized item paths.
+
+    Current item is found by URL, then its path gives ids of all its
+    parents, so root items, current item's neighbours and children
+    are fetched with plain indexed parent lookup without recursion.
+
+    Parameters
+    ----------
+    menu_name : str
+        Menu's name (menu.models.Menu.name).
+
+    Returns
+    -------
+    dict
+        Same as draw_sql_menu.
+    """
+    request = context['request']
+    current_path, current_url_name = get_current_url(request)
+
+    if cache.has_tree(request, menu_name):
+        return draw_cached_menu(request, menu_name,
+                                current_path, current_url_name)
+
+    current_item = Item.objects.filter(menu__name=menu_name,
+                                       menu__site_id__isnull=True) \
+        .filter(Q(url=current_url_name) | Q(url=current_path)) \
+        .values_list('path', flat=True).first()
+
+    # Root items and children of items on the path to current item,
+    # union lets both parts use their own index
+    fields = ITEM_FIELDS + Item.RULE_FIELDS
+    items = Item.objects.filter(menu__name=menu_name,
+                                menu__site_id__isnull=True,
+                                parent__isnull=True) \
+        .values_list(*fields)
+    if current_item:
+        branch = [int(i) for i in current_item.split('/') if i]
+        items = items.union(Item.objects.filter(parent_id__in=branch)
+                            .values_list(*fields), all=True)
+
+    nodes, rules = split_rules(items)
+    levels = MenuTree(nodes, rules=rules) \
+        .for_user(getattr(request, 'user', None)) \
+        .get_levels(current_path, current_url_name)
+    if not levels:
+        logging.error('menu with name "{}" is empty'.format(menu_name))
+    return {'levels': levels, 'menu_name': menu_name}
+
+
+@menu_tag
+def draw_lazy_menu(context, menu_name):
+    """Tag for drawing very large menus with children loaded on demand.
+
+    Like draw_path_menu, only root items and children of items on the
+    path to current item are fetched. Items with children which are not
+    drawn get 'has-children' class and ``children_url`` of JSON with
+    their children (see menu.views.menu_children), so page size does not
+    depend on menu size.
+
+    Parameters
+    ----------
+    menu_name : str
+        Menu's name (menu.models.Menu.name).
+
+    Returns
+    -------
+    dict
+        Same as draw_sql_menu.
+    """
+    request = context['request']
+    current_path, current_url_name = get_current_url(request)
+
+    if cache.has_tree(request, menu_name):
+        data = draw_cached_menu(request, menu_name,
+                                current_path, current_url_name)
+        tree = cache.get_request_tree(request, menu_name)
+        parents = tree.children if tree is not None else ()
+        mark_collapsed(data['levels'], parents, menu_name)
+        return data
+
+    current_item = Item.objects.filter(menu__name=menu_name,
+                                       menu__site_id__isnull=True) \
+        .filter(Q(url=current_url_name) | Q(url=current_path)) \
+        .values_list('path', flat=True).first()
+
+    fields = ITEM_FIELDS + Item.RULE_FIELDS + ('has_children',)
+    has_children = Exists(Item.objects.filter(parent_id=OuterRef('pk')))
+    items = Item.objects.filter(menu__name=menu_name,
+                                menu__site_id__isnull=True,
+                                parent__isnull=True) \
+        .annotate(has_children=has_children).values_list(*fields)
+    if current_item:
+        branch = [int(i) for i in current_item.split('/') if i]
+        items = items.union(Item.objects.filter(parent_id__in=branch)
+                            .annotate(has_children=has_children)
+                            .values_list(*fields), all=True)
+
+    items = list(items)
+    nodes, rules = split_rules(item[:-1] for item in items)
+    parents = set(item[0] for item in items if item[-1])
+    levels = MenuTree(nodes, rules=rules) \
+        .for_user(getattr(request, 'user', None)) \
+        .get_levels(current_path, current_url_name)
+    if not levels:
+        logging.error('menu with name "{}" is empty'.format(menu_name))
+    mark_collapsed(levels, parents, menu_name)
+    return {'levels': levels, 'menu_name': menu_name}
+
+
+def mark_collapsed(levels, parents, menu_name):
+    """Set class and children URL of drawn items with hidden children.
+
+    Parameters
+    ----------
+    levels : list
+        Levels of MenuItem.
+    parents : container
+        Ids of items having children.
+    menu_name : str
+        Menu's name for children URLs.
+    """
+    # Every level but the root one has children of one item
+    expanded = set(level[0].parent_id for level in levels[1:])
+    prefix = children_url_prefix(menu_name)
+    for level in levels:
+        for item in level:
+            if item.id in parents and item.id not in expanded:
+                item.css_class += ' has-children'
+                if prefix is not None:
+                    item.children_url = '{}{}.json'.format(prefix, item.id)
@@ -0,0 +1,522 @@
+# -*- coding: utf-8 -*-
+"""Compiled in-memory menu tree."""
+from __future__ import unicode_literals
+
+import copy
+from collections import OrderedDict
+from collections import namedtuple
+
+from django.conf import settings
+from django.db.models import Q
+from django.urls import get_script_prefix
+from django.urls import get_urlconf
+
+from menu.models import Item
+from menu.models import Menu
+from menu.utils import reverse_url
+
+
+ITEM_FIELDS = ('id', 'menu_id', 'parent_id', 'name', 'url', 'order')
+
+# Immutable item data shared by all requests, 'url' is raw Item.url
+Node = namedtuple('Node', ITEM_FIELDS)
+
+# Bits of visibility rules, permission bits follow them. Item is shown
+# to users having all bits of the item and of its ancestors
+ANONYMOUS = 1
+AUTHENTICATED = 2
+STAFF = 4
+PERMISSION = 8
+VISIBILITY_BITS = {
+    'anonymous': ANONYMOUS,
+    'authenticated': AUTHENTICATED,
+    'staff': AUTHENTICATED | STAFF,
+}
+
+
+def _get_recent(cache, key):
+    """Return value from OrderedDict, moving it to the end."""
+    value = cache.pop(key)
+    cache[key] = value
+    return value
+
+
+def _set_recent(cache, key, value, limit):
+    """Store value in OrderedDict, drop least recently used over limit."""
+    cache[key] = value
+    while len(cache) > limit:
+        try:
+            cache.popitem(last=False)
+        except KeyError:
+            break  # emptied by another thread
+
+
+class MenuItem(object):
+    """Item of one drawn menu: shared node with its href and class.
+
+    Node fields are available as attributes and keys, like
+    ``item.name`` or ``item['name']``, 'url' is reversed URL and
+    'class' is item's class. 'children_url' is set for collapsed items
+    by draw_lazy_menu.
+    """
+
+    __slots__ = ('node', 'url', 'css_class', 'children_url')
+
+    def __init__(self, node, url, css_class, children_url=None):
+        self.node = node
+        self.url = url
+        self.css_class = css_class
+        self.children_url = children_url
+
+    def __getitem__(self, key):
+        if key == 'class':
+            return self.css_class
+        if key == 'url':
+            return self.url
+        if key == 'children_url':
+            return self.children_url
+        try:
+            return getattr(self.node, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __getattr__(self, name):
+        if name in MenuItem.__slots__:
+            raise AttributeError(name)
+        if name == 'class':
+            return self.css_class
+        return getattr(self.node, name)
+
+    def __eq__(self, other):
+        return isinstance(other, MenuItem) and \
+            (self.node, self.url, self.css_class) == \
+            (other.node, other.url, other.css_class)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return 'MenuItem({!r}, url={!r}, class={!r})'.format(
+            self.node, self.url, self.css_class)
+
+
+class MenuTree(object):
+    """All items of one menu indexed by id, parent and URL.
+
+    Tree is built once from a single query and never changed later,
+    so it can be shared between requests and threads.
+    """
+
+    # Pruned trees and path tries kept per tree, least recently used
+    # are dropped over these limits
+    MAX_PRUNED = 8
+    MAX_TRIES = 2
+
+    def __init__(self, items, menu=None, rules=()):
+        """Index items.
+
+        Parameters
+        ----------
+        items : iterable
+            Node tuples of all menu items, or of root items and
+            expanded items' children only.
+        menu : menu.models.Menu, optional
+            Menu of items.
+        rules : iterable, optional
+            (id, visibility, permission) of items with visibility rules.
+        """
+        self.menu_id = menu.id if menu else None
+        self.name = menu.name if menu else None
+        self.depth = menu.depth if menu else None
+        self.site_id = menu.site_id if menu else None
+        self.items = dict()
+        self.children = dict()
+        self.urls = dict()
+        # Path tries by (urlconf, script prefix), built on first use
+        self.tries = OrderedDict()
+        for item in sorted(items, key=lambda x: (x.order, x.id)):
+            self.items[item.id] = item
+            self.children.setdefault(item.parent_id, []).append(item)
+            self.urls.setdefault(item.url, item.id)
+
+        # Rights of users the tree is pruned for, None for full tree
+        self.rights = None
+        self.permissions = []
+        self.masks = dict()
+        # Pruned trees by users' rights, built on first use
+        self.pruned = OrderedDict()
+        if rules:
+            self._compile_rules(rules)
+
+    def _compile_rules(self, rules):
+        """Set masks of items with rules of their own and of ancestors."""
+        own = dict()
+        for item_id, visibility, permission in rules:
+            if permission and permission not in self.permissions:
+                self.permissions.append(permission)
+            own[item_id] = (visibility, permission)
+        self.permissions.sort()
+        bits = dict((permission, PERMISSION << i)
+                    for i, permission in enumerate(self.permissions))
+        for item_id, (visibility, permission) in own.items():
+            own[item_id] = VISIBILITY_BITS.get(visibility, 0) | \
+                bits.get(permission, 0)
+
+        masks = dict()
+        for item_id in self.items:
+            # Walk up to the first item with known mask, parent
+            # cycles stop the walk
+            branch = []
+            node_id = item_id
+            while node_id in self.items and node_id not in masks \
+                    and node_id not in branch:
+                branch.append(node_id)
+                node_id = self.items[node_id].parent_id
+            mask = masks.get(node_id, 0)
+            for node_id in reversed(branch):
+                mask |= own.get(node_id, 0)
+                masks[node_id] = mask
+        self.masks = dict((item_id, mask) for item_id, mask
+                          in masks.items() if mask)
+
+    def get_rights(self, user):
+        """Return bits of tree's rules satisfied by user.
+
+        Parameters
+        ----------
+        user : django.contrib.auth.models.User or None
+            Request's user, None is anonymous.
+        """
+        if user is None or not user.is_authenticated:
+            return ANONYMOUS
+        rights = AUTHENTICATED
+        if user.is_staff:
+            rights |= STAFF
+        for i, permission in enumerate(self.permissions):
+            if user.has_perm(permission):
+                rights |= PERMISSION << i
+        return rights
+
+    def for_user(self, user):
+        """Return tree without items hidden from user by visibility rules.
+
+        Items are pruned in one pass by precomputed masks. ``MAX_PRUNED``
+        recently used pruned trees are cached by user's rights, so users
+        with the same rights share one tree, tree without rules is
+        returned as is.
+        """
+        if not self.masks:
+            return self
+        rights = self.get_rights(user)
+        try:
+            return _get_recent(self.pruned, rights)
+        except KeyError:
+            pass
+
+        hidden = ~rights
+        masks = self.masks
+        tree = copy.copy(self)
+        tree.items = dict()
+        tree.children = dict()
+        tree.urls = dict()
+        tree.tries = OrderedDict()
+        tree.masks = dict()
+        tree.pruned = OrderedDict()
+        tree.rights = rights
+        for parent_id, nodes in self.children.items():
+            nodes = [node for node in nodes
+                     if not masks.get(node.id, 0) & hidden]
+            if not nodes:
+                continue
+            tree.children[parent_id] = nodes
+            for node in nodes:
+                tree.items[node.id] = node
+                tree.urls.setdefault(node.url, node.id)
+        _set_recent(self.pruned, rights, tree, self.MAX_PRUNED)
+        return tree
+
+    @classmethod
+    def from_snapshot(cls, menu):
+        """Build tree of menu's published snapshot.
+
+        Returns None when ``MENU_SNAPSHOTS`` setting is off or menu
+        has no published snapshot, menu must be loaded with
+        ``menu_query()``.
+        """
+        if not use_snapshots() or menu.published is None:
+            return None
+        menu_id = menu.id
+        return cls([Node(item_id, menu_id, parent_id, name, url, order)
+                    for item_id, parent_id, name, url, order
+                    in menu.published.get_items()], menu,
+                   menu.published.get_rules())
+
+    @classmethod
+    def load(cls, menu_key):
+        """Load menu with all its items, return None for unknown menu.
+
+        Published snapshot is loaded with the menu in one query when
+        snapshots are on.
+
+        Parameters
+        ----------
+        menu_key : str or tuple
+            Menu name or (site id, menu name), see ``get_menu_key``.
+        """
+        return cls.load_many([menu_key])[menu_key]
+
+    @classmethod
+    def load_many(cls, menu_keys):
+        """Load several menus with one items query.
+
+        Site's own menus are taken before menus for all sites.
+
+        Returns
+        -------
+        dict
+            MenuTree or None for unknown menu by menu key.
+        """
+        trees = dict((key, None) for key in menu_keys)
+        sites = dict()
+        for key in menu_keys:
+            site_id, name = split_menu_key(key)
+            sites.setdefault(site_id, dict())[name] = key
+
+        menus = dict()
+        for site_id, keys in sites.items():
+            for menu in menu_query().filter(site_filter(site_id),
+                                            name__in=keys):
+                key = keys[menu.name]
+                if key in menus and menu.site_id is None:
+                    continue
+                menus[key] = menu
+
+        # Menu for all sites may be drawn for several keys
+        loaded = dict()
+        for key, menu in menus.items():
+            trees[key] = cls.from_snapshot(menu)
+            if trees[key] is None:
+                loaded.setdefault(menu.id, (menu, []))[1].append(key)
+        items = dict((menu_id, []) for menu_id in loaded)
+        rules = dict((menu_id, []) for menu_id in loaded)
+        nodes, item_rules = split_rules(
+            Item.objects.filter(menu_id__in=loaded)
+            .values_list(*ITEM_FIELDS + Item.RULE_FIELDS))
+        for item in nodes:
+            items[item.menu_id].append(item)
+        menu_ids = dict((item.id, item.menu_id) for item in nodes)
+        for rule in item_rules:
+            rules[menu_ids[rule[0]]].append(rule)
+        for menu_id, (menu, keys) in loaded.items():
+            tree = cls(items[menu_id], menu, rules[menu_id])
+            for key in keys:
+                trees[key] = tree
+        return trees
+
+    def find_current(self, current_path, current_url_name):
+        """Return id of item with URL equal to current path or URL name."""
+        item_id = self.urls.get(current_path)
+        if item_id is None and current_url_name:
+            item_id = self.urls.get(current_url_name)
+        if item_id is None and getattr(settings, 'MENU_PREFIX_MATCH', False):
+            item_id = self.find_prefix(current_path)
+        return item_id
+
+    def find_prefix(self, current_path):
+        """Return id of item with the longest URL prefixing current path.
+
+        URLs are compared by whole path segments, so '/blog' matches
+        '/blog/2024/post' but not '/blogs'. Root URL '/' matches only
+        exactly.
+        """
+        node = self.get_trie()
+        item_id = None
+        for segment in current_path.split('/'):
+            if not segment:
+                continue
+            node = node.get(segment)
+            if node is None:
+                break
+            item_id = node.get(None, item_id)
+        return item_id
+
+    def get_trie(self):
+        """Return trie of item paths for current URLconf and script prefix.
+
+        Trie nodes are dicts by path segment, item id is kept by None key.
+        """
+        prefix = get_script_prefix()
+        key = (get_urlconf(), prefix)
+        try:
+            return _get_recent(self.tries, key)
+        except KeyError:
+            pass
+
+        trie = dict()
+        for nodes in self.children.values():
+            for item in nodes:
+                url = item.url
+                if '/' not in url:
+                    # Reversed URLs start with script prefix, unlike path
+                    url = reverse_url(url)
+                    if not url.startswith(prefix):
+                        continue  # unknown name
+                    url = url[len(prefix):]
+                elif not url.startswith('/'):
+                    continue  # external URL
+                node = trie
+                for segment in url.split('/'):
+                    if segment:
+                        node = node.setdefault(segment, dict())
+                if node is not trie:
+                    node.setdefault(None, item.id)
+        _set_recent(self.tries, key, trie, self.MAX_TRIES)
+        return trie
+
+    def get_levels(self, current_path, current_url_name, depth=None):
+        """Build levels list like the menu tags do.
+
+        Parameters
+        ----------
+        current_path : str
+            Current request path.
+        current_url_name : str
+            URL name resolved from current path.
+        depth : int, optional
+            Maximum nesting level of current item, as ``Menu.depth``
+            for orm tag. Menu is not expanded for deeper items.
+
+        Returns
+        -------
+        list
+            Levels of MenuItem, root level first.
+        """
+        branch = self.get_branch(current_path, current_url_name, depth)
+        selected = set(branch)
+        current_id = branch[-1] if branch else None
+
+        levels = []
+        for parent_id in [None] + branch[:-1]:
+            levels.append(self._level(parent_id, current_id, selected))
+        if current_id is not None and current_id in self.children:
+            levels.append(self._level(current_id, None, (), 'child'))
+
+        return [level for level in levels if level]
+
+    def get_ancestry(self, current_path, current_url_name, depth=None):
+        """Return MenuItem list from root to current item, as breadcrumbs.
+
+        Items are the 'selected' and 'current' items of get_levels.
+        """
+        branch = self.get_branch(current_path, current_url_name, depth)
+        ancestry = []
+        for item_id in branch:
+            node = self.items[item_id]
+            css_class = 'current' if item_id == branch[-1] else 'selected'
+            ancestry.append(MenuItem(node, reverse_url(node.url), css_class))
+        return ancestry
+
+    def get_branch(self, current_path, current_url_name, depth=None):
+        """Return ids of items from root to current item.
+
+        Empty when nothing matched or current item is not reachable
+        from root or is deeper than depth.
+        """
+        # Walk up from current item, parent cycles stop the walk
+        branch = []
+        selected = set()
+        item_id = self.find_current(current_path, current_url_name)
+        while item_id is not None and item_id not in selected:
+            branch.append(item_id)
+            selected.add(item_id)
+            node = self.items.get(item_id)
+            item_id = node.parent_id if node else None
+        branch.reverse()
+
+        # Tree may have only part of items, as orm tag loads them, and
+        # menu is not expanded when current item is not reachable from root
+        if branch:
+            top = self.items.get(branch[0])
+            if top is None or top.parent_id is not None:
+                branch = []
+        if depth is not None and len(branch) > max(depth, 1):
+            branch = []
+        return branch
+
+    def _level(self, parent_id, current_id, selected, item_class=None):
+        """Return items with given parent with their classes."""
+        level = []
+        for node in self.children.get(parent_id, ()):
+            if item_class:
+                css_class = item_class
+            elif node.id == current_id:
+                css_class = 'current'
+            elif node.id in selected:
+                css_class = 'selected'
+            elif node.parent_id is None:
+                css_class = 'root'
+            else:
+                css_class = 'neighbour'
+            level.append(MenuItem(node, reverse_url(node.url), css_class))
+        return level
+
+
+def split_rules(rows):
+    """Split item rows into nodes and rules.
+
+    Parameters
+    ----------
+    rows : iterable
+        Values of ``ITEM_FIELDS`` and ``Item.RULE_FIELDS``.
+
+    Returns
+    -------
+    tuple
+        List of Node and list of (id, visibility, permission) of items
+        with rules, as MenuTree takes them.
+    """
+    size = len(ITEM_FIELDS)
+    nodes = []
+    rules = []
+    for row in rows:
+        nodes.append(Node._make(row[:size]))
+        if any(row[size:]):
+            rules.append((row[0],) + tuple(row[size:]))
+    return nodes, rules
+
+
+def use_snapshots():
+    """Check ``MENU_SNAPSHOTS`` setting."""
+    return getattr(settings, 'MENU_SNAPSHOTS', False)
+
+
+def menu_query():
+    """Return Menu queryset, with published snapshots if they are used."""
+    if use_snapshots():
+        return Menu.objects.select_related('published')
+    return Menu.objects.all()
+
+
+def get_menu_key(site_id, menu_name):
+    """Return key of menu drawn for site in caches.
+
+    Menu name, or (site id, menu name) when ``MENU_SITES`` setting
+    is on and site is known.
+    """
+    if site_id is None or not getattr(settings, 'MENU_SITES', False):
+        return menu_name
+    return (site_id, menu_name)
+
+
+def split_menu_key(menu_key):
+    """Return (site id or None, menu name) of menu key."""
+    if isinstance(menu_key, tuple):
+        return menu_key
+    return None, menu_key
+
+
+def site_filter(site_id):
+    """Return filter of menus for site: site's own and for all sites."""
+    if site_id is None:
+        return Q(site_id__isnull=True)
+    return Q(site_id=site_id) | Q(site_id__isnull=True)
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+"""Menu URLs, include them like ``url(r'^menus/', include('menu.urls'))``."""
+from __future__ import unicode_literals
+
+try:
+    from django.urls import re_path
+except ImportError:  # Django < 2.0
+    from django.conf.urls import url as re_path
+
+from menu import views
+
+
+app_name = 'menu'
+
+urlpatterns = [
+    re_path(r'^(?P<menu_name>[^/]+)\.json$', views.menu_json,
+            name='menu_json'),
+    re_path(r'^(?P<menu_name>[^/]+)/children/(?P<parent_id>\d+)\.json$',
+            views.menu_children, name='menu_children'),
+]
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""URL helpers for menu drawing."""
+from __future__ import unicode_literals
+
+import timeit
+
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.urls import get_script_prefix
+from django.urls import get_urlconf
+from django.urls import resolve
+from django.urls import reverse
+from django.urls.exceptions import NoReverseMatch
+
+from menu import instrumentation
+
+
+# {(urlconf, script prefix): {url name: href}}
+_reversed = dict()
+
+
+def reverse_url(url):
+    """Reverse named URL, leave raw URL as is.
+
+    Results are cached for current URLconf and script prefix,
+    unknown names are reversed to '#'.
+    """
+    if '/' in url:
+        return url
+
+    key = (get_urlconf(), get_script_prefix())
+    try:
+        return _reversed[key][url]
+    except KeyError:
+        pass
+
+    stats = instrumentation.active()
+    if stats is not None:
+        start = timeit.default_timer()
+    try:
+        href = reverse(url)
+    except NoReverseMatch:
+        href = '#'
+    _reversed.setdefault(key, dict())[url] = href
+    if stats is not None:
+        stats.reversed += 1
+        stats.reverse_time += timeit.default_timer() - start
+    return href
+
+
+def children_url_prefix(menu_name):
+    """Return start of menu items' children URLs, before "<id>.json".
+
+    Returns None when menu.urls are not included in URLconf.
+    """
+    try:
+        url = reverse('menu:menu_children', args=[menu_name, 0])
+    except NoReverseMatch:
+        return None
+    return url[:-len('0.json')]
+
+
+def get_current_url(request):
+    """Return current path and its URL name.
+
+    URL is resolved once per request and shared by all menu tags.
+    Request's resolver match is used if the request was handled by view.
+    """
+    try:
+        return request._menu_current_url
+    except AttributeError:
+        pass
+
+    current_path = request.path_info
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        match = resolve(current_path)
+    request._menu_current_url = (current_path, match.url_name)
+    return request._menu_current_url
+
+
+def clear_reversed():
+    """Drop cached reversed URLs."""
+    _reversed.clear()
+
+
+@receiver(setting_changed)
+def urlconf_changed(setting, **kwargs):
+    if setting == 'ROOT_URLCONF':
+        clear_reversed()
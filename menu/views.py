@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""Menus as JSON for JavaScript and mobile clients."""
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.http import Http404
+from django.http import JsonResponse
+from django.http import StreamingHttpResponse
+from django.urls import Resolver404
+from django.urls import resolve
+from django.utils.cache import get_conditional_response
+from django.utils.cache import patch_cache_control
+from django.utils.cache import patch_vary_headers
+from django.db.models import Exists
+from django.db.models import OuterRef
+from django.db.models import Q
+from django.views.decorators.http import require_GET
+
+from menu import cache
+from menu import sitemaps
+from menu.models import Item
+from menu.models import Menu
+from menu.tree import ITEM_FIELDS
+from menu.tree import MenuTree
+from menu.tree import site_filter
+from menu.tree import split_menu_key
+from menu.tree import split_rules
+from menu.utils import children_url_prefix
+from menu.utils import reverse_url
+
+
+ITEM_KEYS = ('id', 'parent_id', 'name', 'url', 'class')
+
+
+@require_GET
+def menu_json(request, menu_name):
+    """Menu levels for page ``path`` query parameter as JSON.
+
+    Response has the same levels as menu tags draw, with ETag of menu
+    version and current item, so unchanged menus are answered with
+    304 Not Modified without building levels.
+    """
+    path = request.GET.get('path', '/')
+    try:
+        url_name = resolve(path).url_name
+    except Resolver404:
+        url_name = None
+
+    key = cache.menu_key(request, menu_name)
+    if getattr(settings, 'MENU_TREE_CACHE', True):
+        tree = cache.get_tree(key, request)
+        version = tree and tree.version
+    else:
+        version = cache.get_version(key)
+        tree = MenuTree.load(key)
+    if tree is None:
+        raise Http404('Menu with name "{}" not found'.format(menu_name))
+
+    tree = tree.for_user(getattr(request, 'user', None))
+    item_id = tree.find_current(path, url_name)
+    etag = cache.menu_etag(key, version, item_id, tree.rights)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        levels = tree.get_levels(path, url_name)
+        response = JsonResponse({
+            'menu_name': tree.name,
+            'levels': [[dict((key, item[key]) for key in ITEM_KEYS)
+                        for item in level] for level in levels],
+        })
+    response['ETag'] = etag
+    patch_menu_cache(response, tree.rights is not None)
+    return response
+
+
+@require_GET
+def menu_children(request, menu_name, parent_id):
+    """Children of one item as JSON, for items collapsed by draw_lazy_menu.
+
+    Children are taken from cached tree, or without tree cache fetched
+    with the item's ancestors by indexed lookups, so response time does
+    not depend on menu size. Items hidden from user by visibility rules
+    are left out. ETag is changed with menu version and user's rights.
+    """
+    parent_id = int(parent_id)
+    key = cache.menu_key(request, menu_name)
+    parents = None
+    if getattr(settings, 'MENU_TREE_CACHE', True):
+        tree = cache.get_tree(key, request)
+        version = tree and tree.version
+    else:
+        # Version read first may be older than data, never newer
+        version = cache.get_version(key)
+        tree, parents = load_children(key, parent_id)
+    if tree is not None:
+        tree = tree.for_user(getattr(request, 'user', None))
+    if tree is None or parent_id not in tree.items:
+        raise Http404('Item {} not found'.format(parent_id))
+    if parents is None:
+        parents = tree.children
+
+    etag = cache.menu_etag(key, version, 'children-{}'.format(parent_id),
+                           tree.rights)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        prefix = children_url_prefix(menu_name)
+        response = JsonResponse({
+            'parent_id': parent_id,
+            'items': [{
+                'id': node.id,
+                'name': node.name,
+                'url': reverse_url(node.url),
+                'children_url': '{}{}.json'.format(prefix, node.id)
+                if node.id in parents else None,
+            } for node in tree.children.get(parent_id, ())],
+        })
+    response['ETag'] = etag
+    patch_menu_cache(response, tree.rights is not None)
+    return response
+
+
+def load_children(menu_key, parent_id):
+    """Load item with its ancestors and children.
+
+    Returns
+    -------
+    tuple
+        MenuTree of items or None for unknown item, and ids of children
+        having children themselves.
+    """
+    site_id, menu_name = split_menu_key(menu_key)
+    path = Item.objects.filter(
+        menu__in=Menu.objects.filter(site_filter(site_id), name=menu_name),
+        pk=parent_id).values_list('path', flat=True).first()
+    if path is None:
+        return None, ()
+
+    # Rules of ancestors apply to children too
+    branch = [int(i) for i in path.split('/') if i]
+    rows = Item.objects \
+        .filter(Q(pk__in=branch) | Q(parent_id=parent_id)) \
+        .annotate(has_children=Exists(
+            Item.objects.filter(parent_id=OuterRef('pk')))) \
+        .values_list(*ITEM_FIELDS + Item.RULE_FIELDS + ('has_children',))
+    rows = list(rows)
+    nodes, rules = split_rules(row[:-1] for row in rows)
+    parents = set(row[0] for row in rows if row[-1])
+    return MenuTree(nodes, rules=rules), parents
+
+
+def patch_menu_cache(response, private=False):
+    """Set Cache-Control of JSON menu.
+
+    Menus pruned by visibility rules differ by user, so they are cached
+    by browsers only.
+    """
+    max_age = getattr(settings, 'MENU_JSON_MAX_AGE', 0)
+    if private:
+        patch_cache_control(response, private=True, max_age=max_age)
+        patch_vary_headers(response, ['Cookie'])
+    else:
+        patch_cache_control(response, public=True, max_age=max_age)
+
+
+@require_GET
+def menu_sitemap(request, menu_names=None):
+    """Sitemap of menu items' URLs streamed while read from database.
+
+    Sitemaps over ``menu.sitemaps.MAX_URLS`` URLs are answered with
+    sitemap index of pages ``?p=1``, ``?p=2`` and so on. Include it at
+    site root, as sitemap may list URLs under its own location only::
+
+        url(r'^sitemap\\.xml$', menu_sitemap, {'menu_names': ['main']}),
+
+    Item URLs are short, so pages never reach size limit of sitemap.
+    """
+    urls = sitemaps.MenuURLs(menu_names)
+    base_url = '{}://{}'.format(request.scheme, request.get_host())
+    limit = sitemaps.MAX_URLS
+    page = request.GET.get('p')
+    if page is not None:
+        try:
+            page = int(page)
+        except ValueError:
+            raise Http404('Bad page')
+        if page < 1:
+            raise Http404('Bad page')
+        content = sitemaps.urlset(
+            base_url, urls.iterate((page - 1) * limit, page * limit))
+    else:
+        count = len(urls)
+        if count <= limit:
+            content = sitemaps.urlset(base_url, urls)
+        else:
+            location = request.build_absolute_uri(request.path)
+            content = sitemaps.sitemap_index(
+                '{}?p={}'.format(location, page)
+                for page in range(1, (count - 1) // limit + 2))
+    return StreamingHttpResponse(content, content_type='application/xml')
@@ -0,0 +1,18 @@
+#!/usr/bin/env python
+import os
+import sys
+
+import django
+from django.db import connection
+from django.test.utils import setup_test_environment
+
+if __name__ == "__main__":
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'benchmarks.settings'
+    django.setup()
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        from benchmarks.run import main
+        main(sys.argv[1:])
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
@@ -0,0 +1,132 @@
+"""Menu admin tree editor tests."""
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+try:
+    from unittest import mock
+except:
+    import mock
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from menu import cache
+from menu.admin import MenuAdmin
+from menu.models import Menu, Item
+
+
+@override_settings(ROOT_URLCONF='tests.urls_admin')
+class TreeEditorTestCase(TestCase):
+    """Lazy children and bulk moves of tree editor."""
+
+    def setUp(self):
+        cache.clear()
+        self.menu = menu = Menu.objects.create(name='main', depth=4)
+        self.i1 = Item.objects.create(menu=menu, name='I1', url='/i1')
+        self.i2 = Item.objects.create(menu=menu, name='I2', url='/i2',
+                                      order=1)
+        self.i11 = Item.objects.create(menu=menu, name='I11', url='/i11',
+                                       parent=self.i1)
+        self.i111 = Item.objects.create(menu=menu, name='I111',
+                                        url='/i111', parent=self.i11)
+        self.other = Item.objects.create(
+            menu=Menu.objects.create(name='other'), name='O', url='/o')
+        user = User.objects.create_superuser('admin', 'a@example.com', 'pw')
+        self.client.force_login(user)
+
+    def url(self, name):
+        return reverse('admin:menu_menu_' + name, args=[self.menu.pk])
+
+    def move(self, moves):
+        return self.client.post(self.url('tree_move'),
+                                json.dumps({'moves': moves}),
+                                content_type='application/json')
+
+    def test_pages(self):
+        """Tree page is linked from menu page."""
+        response = self.client.get(self.url('change'))
+        self.assertContains(response, self.url('tree'))
+        response = self.client.get(self.url('tree'))
+        self.assertContains(response, self.url('tree_children'))
+
+    def test_inline_limit(self):
+        """Big menus are not edited inline."""
+        response = self.client.get(self.url('change'))
+        self.assertEqual(len(response.context['inline_admin_formsets']), 1)
+        MenuAdmin.inline_limit = 2
+        self.addCleanup(setattr, MenuAdmin, 'inline_limit', 100)
+        response = self.client.get(self.url('change'))
+        self.assertEqual(len(response.context['inline_admin_formsets']), 0)
+
+    def test_children(self):
+        """Children of one item are loaded by page."""
+        with self.assertNumQueries(4):  # session, user, menu, items
+            data = self.client.get(self.url('tree_children')).json()
+        self.assertEqual(
+            [(i['name'], i['children_count']) for i in data['items']],
+            [('I1', 1), ('I2', 0)])
+        self.assertFalse(data['more'])
+
+        data = self.client.get(self.url('tree_children'),
+                               {'parent': self.i1.pk}).json()
+        self.assertEqual([i['name'] for i in data['items']], ['I11'])
+
+        data = self.client.get(self.url('tree_children'),
+                               {'limit': 1, 'offset': 1}).json()
+        self.assertEqual([i['name'] for i in data['items']], ['I2'])
+
+        response = self.client.get(self.url('tree_children'),
+                                   {'parent': self.other.pk})
+        self.assertEqual(response.status_code, 404)
+
+    def test_move(self):
+        """Moves are saved with paths and menu version is changed once."""
+        version = cache.get_version('main')
+        with mock.patch('django.db.transaction.on_commit',
+                        lambda func, using=None: func()):
+            response = self.move([
+                {'id': self.i11.pk, 'parent': None, 'order': 0},
+                {'id': self.i1.pk, 'parent': None, 'order': 1},
+                {'id': self.i2.pk, 'parent': self.i111.pk, 'order': 0},
+            ])
+        self.assertEqual(response.json(), {'moved': 3})
+        self.assertEqual(cache.get_version('main'), version + 1)
+
+        items = dict((i.name, i) for i in Item.objects.all())
+        self.assertEqual(items['I11'].parent_id, None)
+        self.assertEqual(items['I1'].order, 1)
+        self.assertEqual(items['I2'].parent_id, self.i111.pk)
+        self.assertEqual(items['I2'].path, '{}/{}/{}/'.format(
+            self.i11.pk, self.i111.pk, self.i2.pk))
+
+    def test_bad_moves(self):
+        """Invalid moves change nothing."""
+        paths = sorted(Item.objects.values_list('id', 'parent_id', 'path'))
+        response = self.move([
+            {'id': self.i2.pk, 'parent': self.i1.pk, 'order': 0},
+            {'id': self.i1.pk, 'parent': self.i111.pk, 'order': 0},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cycle', response.json()['error'])
+        response = self.move([{'id': self.other.pk, 'parent': None,
+                               'order': 0}])
+        self.assertEqual(response.status_code, 400)
+        response = self.move([{'id': 'x'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            sorted(Item.objects.values_list('id', 'parent_id', 'path')),
+            paths)
+
+    def test_move_items(self):
+        """Many items are moved with few queries."""
+        moves = [(item.pk, None, i) for i, item in
+                 enumerate(Item.objects.filter(menu=self.menu))]
+        # Items, update, paths, paths update and savepoints
+        with self.assertNumQueries(8):
+            self.menu.move_items(moves)
+        with self.assertRaises(ValidationError):
+            self.menu.move_items([(self.i1.pk, None, -1)])
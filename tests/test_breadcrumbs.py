@@ -0,0 +1,77 @@
+"""Breadcrumbs tags tests."""
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.test import TestCase, RequestFactory
+from django.template import Context, Template
+from django.test.utils import override_settings
+
+from menu import cache
+from menu.models import Menu, Item
+
+
+@override_settings(ROOT_URLCONF='tests.test_tags')
+class BreadcrumbsTestCase(TestCase):
+    """Breadcrumbs share current item's ancestry with menu tags."""
+
+    def setUp(self):
+        """Create menu."""
+        cache.clear()
+        self.factory = RequestFactory()
+        menu = Menu.objects.create(name='main')
+        index = Item.objects.create(menu=menu, name='Index', url='index')
+        i2 = Item.objects.create(menu=menu, name='I2', url='/i2',
+                                 parent=index)
+        Item.objects.create(menu=menu, name='I3', url='/i3', parent=i2)
+        Item.objects.create(menu=menu, name='I4', url='/i4')
+
+    def render(self, source, path='/i3'):
+        template = Template('{% load menus %}' + source)
+        return template.render(Context({'request': self.factory.get(path)}))
+
+    def names(self, source, path='/i3'):
+        return self.render(source + '{% get_breadcrumbs "main" as items %}'
+                           '{% for i in items %}{{ i.name }}:{{ i.class }}'
+                           '{% if not forloop.last %},{% endif %}'
+                           '{% endfor %}', path).split('|')[-1]
+
+    def test_ancestry(self):
+        """Breadcrumbs are the same whichever tag draws the menu."""
+        for tree_cache in (True, False):
+            with self.settings(MENU_TREE_CACHE=tree_cache):
+                for tag in ('', 'draw_sql_menu', 'draw_orm_menu',
+                            'draw_path_menu', 'draw_lazy_menu'):
+                    source = '{% ' + tag + ' "main" %}|' if tag else ''
+                    self.assertEqual(self.names(source),
+                                     'Index:selected,I2:selected,I3:current')
+                    self.assertEqual(self.names(source, '/i5'), '')
+
+    def test_html(self):
+        """Parents are linked, current item is not."""
+        html = self.render('{% draw_breadcrumbs "main" %}')
+        self.assertInHTML('<li class="selected"><a href="/i2">I2</a></li>',
+                          html)
+        self.assertInHTML('<li class="current">I3</li>', html)
+        self.assertInHTML('<ul id="breadcrumbs-none" class="breadcrumbs">'
+                          '</ul>', self.render('{% draw_breadcrumbs "none" %}'))
+
+    @override_settings(MENU_TREE_CACHE=False)
+    def test_no_extra_queries(self):
+        """Menu with breadcrumbs costs the same queries as menu alone."""
+        menu = '{% draw_sql_menu "main" %}'
+        breadcrumbs = '{% draw_breadcrumbs "main" %}'
+        with self.assertNumQueries(1):
+            self.render(menu)
+        with self.assertNumQueries(1):
+            self.render(menu + breadcrumbs)
+        # Tree loaded for breadcrumbs is shared with menu
+        with self.assertNumQueries(2):
+            html = self.render(breadcrumbs + menu)
+        self.assertIn('I3', html)
+
+    def test_cached(self):
+        """Cached trees draw breadcrumbs without queries."""
+        self.render('{% draw_breadcrumbs "main" %}')
+        with self.assertNumQueries(0):
+            self.render('{% draw_breadcrumbs "main" %}'
+                        '{% draw_sql_menu "main" cache=True %}')
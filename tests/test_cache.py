@@ -0,0 +1,304 @@
+"""Menu tree cache tests."""
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import shutil
+import tempfile
+import timeit
+try:
+    from unittest import mock
+except:
+    import mock
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase, RequestFactory
+from django.template import Context, Template
+from django.test.utils import override_settings
+
+from menu import cache
+from menu.models import Menu, Item
+from menu.templatetags import menus
+
+
+@override_settings(ROOT_URLCONF='tests.test_tags')
+class MenuCacheTestCase(TestCase):
+    """Cached menu tree testcase."""
+
+    def setUp(self):
+        """Create menu with items."""
+        cache.clear()
+        self.factory = RequestFactory()
+        self.menu = Menu.objects.create(name='main', depth=2)
+        Item.objects.bulk_create([
+            Item(id=1, menu=self.menu, name='Index', url='index'),
+            Item(id=2, menu=self.menu, name='I2', url='/i2', parent_id=1),
+            Item(id=22, menu=self.menu, name='I22', url='/i22', parent_id=1),
+            Item(id=3, menu=self.menu, name='I3', url='/i3', parent_id=2),
+            Item(id=4, menu=self.menu, name='I4', url='/i4', parent_id=3),
+            Item(id=6, menu=self.menu, name='I6', url='/another_root'),
+        ])
+
+    def levels(self, tag, path):
+        """Return (name, url, class) tuples of tag's levels."""
+        context = Context({'request': self.factory.get(path)})
+        result = getattr(menus, tag)(context, 'main') or {'levels': []}
+        return [[(i['name'], i['url'], i['class']) for i in level]
+                for level in result['levels']]
+
+    def test_same_levels(self):
+        """Cached tree gives the same levels as database queries."""
+        for tag in ('draw_sql_menu', 'draw_orm_menu'):
+            for path in ('/', '/i2', '/i3', '/i4', '/i5'):
+                with override_settings(MENU_TREE_CACHE=False):
+                    expected = self.levels(tag, path)
+                self.assertEqual(self.levels(tag, path), expected)
+
+    def test_shared_nodes(self):
+        """Drawn menus share tree nodes, classes are kept apart."""
+        first = menus.draw_sql_menu(
+            Context({'request': self.factory.get('/i3')}), 'main')['levels']
+        second = menus.draw_sql_menu(
+            Context({'request': self.factory.get('/')}), 'main')['levels']
+        self.assertIs(first[0][0].node, second[0][0].node)
+        self.assertEqual(first[0][0]['class'], 'selected')
+        self.assertEqual(second[0][0]['class'], 'current')
+        self.assertEqual(second[0][0].url, '/')
+        self.assertEqual(second[0][0].node.url, 'index')
+
+    def test_no_queries(self):
+        """Cached tree is loaded once."""
+        t = Template('{% load menus %}{% draw_sql_menu "main" %}'
+                     '{% draw_orm_menu "main" %}{% draw_sql_menu "none" %}')
+        c = Context({'request': self.factory.get('/i3')})
+        t.render(c)
+        with self.assertNumQueries(0):
+            t.render(c)
+
+    def test_invalidation(self):
+        """Menu changes are shown right away."""
+        t = Template('{% load menus %}{% draw_sql_menu "main" %}')
+        c = Context({'request': self.factory.get('/i3')})
+        t.render(c)
+
+        Item.objects.create(menu=self.menu, name='New', url='/i5', parent_id=3)
+        self.assertInHTML('<li class="child"><a href="/i5">New</a></li>',
+                          t.render(c))
+
+        Item.objects.get(url='/i5').delete()
+        self.assertNotIn('New', t.render(c))
+
+        self.menu.name = 'renamed'
+        self.menu.save()
+        self.assertNotIn('I3', t.render(c))
+
+    def test_moved_item(self):
+        """Item moved to another menu leaves both menus' trees."""
+        other = Menu.objects.create(name='other')
+        cache.get_trees(['main', 'other'])
+        item = Item.objects.get(id=6)
+        item.menu = other
+        item.save()
+        self.assertNotIn(6, cache.get_tree('main').items)
+        self.assertIn(6, cache.get_tree('other').items)
+
+    def test_bulk_delete(self):
+        """Deleted items change menu once per transaction."""
+        with mock.patch('menu.cache.bump_version') as bump_version, \
+                self.assertNumQueries(4):
+            Item.objects.filter(parent_id__isnull=False).delete()
+        bump_version.assert_called_once_with('main')
+        self.assertEqual(list(cache.get_tree('main').items), [1, 6])
+
+
+@override_settings(ROOT_URLCONF='tests.test_tags', MENU_CACHE=True)
+class MenuFragmentCacheTestCase(TestCase):
+    """Rendered menu cache testcase."""
+
+    def setUp(self):
+        """Create menu with items."""
+        cache.clear()
+        cache.get_backend().clear()
+        self.factory = RequestFactory()
+        self.menu = Menu.objects.create(name='main')
+        self.index = Item.objects.create(menu=self.menu, name='Index',
+                                         url='index')
+        Item.objects.create(menu=self.menu, name='I2', url='/i2',
+                            parent=self.index)
+        self.template = Template('{% load menus %}{% draw_sql_menu "main" %}')
+
+    def render(self, path, template=None):
+        context = Context({'request': self.factory.get(path)})
+        return (template or self.template).render(context)
+
+    def test_cached(self):
+        """Rendered menu is taken from cache."""
+        rendered_page = self.render('/')
+        with mock.patch('menu.templatetags.menus.draw_cached_menu') as draw:
+            self.assertEqual(self.render('/'), rendered_page)
+        self.assertFalse(draw.called)
+
+        # Other current item has its own menu
+        self.assertInHTML('<li class="current">I2</li>', self.render('/i2'))
+
+    def test_disabled(self):
+        """Tag argument disables cache."""
+        t = Template('{% load menus %}{% draw_sql_menu "main" cache=False %}')
+        self.render('/', t)
+        with mock.patch('menu.templatetags.menus.draw_cached_menu',
+                        return_value={'levels': []}) as draw:
+            self.render('/', t)
+        self.assertTrue(draw.called)
+
+    def test_variants(self):
+        """Renderers and autoescape have own rendered menus."""
+        keys = set()
+        fragment_key = cache.fragment_key
+
+        def get_key(*args):
+            keys.add(fragment_key(*args))
+            return fragment_key(*args)
+
+        with mock.patch('menu.cache.fragment_key', get_key):
+            for template in ('{% draw_sql_menu "main" %}',
+                             '{% draw_sql_menu "main" renderer="python" %}',
+                             '{% autoescape off %}{% draw_sql_menu "main" %}'
+                             '{% endautoescape %}'):
+                self.render('/', Template('{% load menus %}' + template))
+        self.assertEqual(len(keys), 3)
+
+    def test_version(self):
+        """Menu changes drop rendered menus."""
+        self.render('/')
+        version = cache.get_version('main')
+        self.index.name = 'Home'
+        self.index.save()
+        self.assertNotEqual(cache.get_version('main'), version)
+        self.assertInHTML('<li class="current">Home</li>', self.render('/'))
+
+
+@override_settings(ROOT_URLCONF='tests.test_tags', MENU_VERSION_TTL=60)
+class MenuVersionCheckTestCase(TestCase):
+    """Trees changed by other processes testcase."""
+
+    def setUp(self):
+        """Create menu with items."""
+        cache.clear()
+        self.factory = RequestFactory()
+        self.menu = Menu.objects.create(name='main')
+        self.index = Item.objects.create(menu=self.menu, name='Index',
+                                         url='index')
+        self.template = Template('{% load menus %}{% draw_sql_menu "main" %}'
+                                 '{% draw_orm_menu "main" %}')
+        self.tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempdir)
+
+    def render(self):
+        return self.template.render(Context({'request': self.factory.get('/')}))
+
+    def change_on_other_node(self, name):
+        """Change item without signals like another process does."""
+        Item.objects.filter(pk=self.index.pk).update(name=name)
+        cache.bump_version('main')
+
+    def backends(self):
+        """Settings of local memory, file and database caches."""
+        yield {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+        yield {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+               'LOCATION': self.tempdir}
+        yield {'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+               'LOCATION': 'menu_cache_table'}
+
+    def test_backends(self):
+        """Changed version reloads tree once TTL has passed."""
+        for backend in self.backends():
+            with override_settings(CACHES={'default': backend}):
+                if 'db' in backend['BACKEND']:
+                    call_command('createcachetable', verbosity=0)
+                cache.clear()
+                self.change_on_other_node('Home')
+                self.assertIn('Home', self.render())
+
+                self.change_on_other_node('Start')
+                self.assertNotIn('Start', self.render())
+                with mock.patch('timeit.default_timer',
+                                return_value=timeit.default_timer() + 61):
+                    self.assertIn('Start', self.render())
+
+    def test_once_per_request(self):
+        """Version is checked once per request with zero TTL."""
+        self.render()
+        with override_settings(MENU_VERSION_TTL=0), \
+                mock.patch('menu.cache.get_versions',
+                           wraps=cache.get_versions) as get_versions:
+            self.change_on_other_node('Home')
+            self.assertEqual(self.render().count('Home'), 2)
+            self.assertEqual(get_versions.call_count, 1)
+            with self.assertNumQueries(0):
+                self.render()
+            self.assertEqual(get_versions.call_count, 2)
+
+    def test_default(self):
+        """Versions are checked every request by default."""
+        self.render()
+        with override_settings():
+            del settings.MENU_VERSION_TTL
+            self.change_on_other_node('Home')
+            self.assertIn('Home', self.render())
+
+    def test_disabled(self):
+        """Without TTL trees change on local signals only."""
+        self.render()
+        with override_settings(MENU_VERSION_TTL=None):
+            self.change_on_other_node('Home')
+            with mock.patch('menu.cache.get_versions') as get_versions:
+                self.assertNotIn('Home', self.render())
+            self.assertFalse(get_versions.called)
+
+
+@override_settings(ROOT_URLCONF='tests.test_tags')
+class TreeCacheLimitTestCase(TestCase):
+    """Process tree cache limits."""
+
+    def setUp(self):
+        """Create menus."""
+        cache.clear()
+        cache._trees.reset_stats()
+        for name in ('m1', 'm2', 'm3'):
+            menu = Menu.objects.create(name=name)
+            Item.objects.create(menu=menu, name='Index', url='index')
+
+    def test_unbounded(self):
+        """Trees are kept without limits."""
+        cache.get_trees(['m1', 'm2', 'm3'])
+        cache.get_tree('m1')
+        stats = cache.get_stats()
+        self.assertEqual(stats['entries'], 3)
+        self.assertEqual(stats['evictions'], 0)
+        self.assertEqual(stats['hits'], 1)
+        self.assertGreater(stats['bytes'], 0)
+
+    @override_settings(MENU_TREE_CACHE_ENTRIES=2)
+    def test_entries(self):
+        """Least recently used trees are evicted over entries limit."""
+        cache.get_tree('m1')
+        cache.get_tree('m2')
+        cache.get_tree('m1')
+        cache.get_tree('m3')
+        self.assertEqual(cache.get_stats()['entries'], 2)
+        self.assertEqual(cache.get_stats()['evictions'], 1)
+        with self.assertNumQueries(0):
+            cache.get_tree('m1')
+            cache.get_tree('m3')
+        with self.assertNumQueries(2):
+            cache.get_tree('m2')
+
+    def test_bytes(self):
+        """Trees are evicted over bytes limit."""
+        cache.get_tree('m1')
+        size = cache.get_stats()['bytes']
+        with self.settings(MENU_TREE_CACHE_BYTES=size * 2):
+            cache.get_tree('m2')
+            cache.get_tree('m3')
+            stats = cache.get_stats()
+        self.assertEqual(stats['entries'], 2)
+        self.assertLessEqual(stats['bytes'], size * 2)
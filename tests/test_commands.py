@@ -0,0 +1,151 @@
+"""Menu management commands tests."""
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+import os
+import tempfile
+try:
+    from unittest import mock
+except:
+    import mock
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from menu import cache
+from menu.models import Menu, Item
+
+
+@override_settings(ROOT_URLCONF='tests.test_tags')
+class ExportImportTestCase(TestCase):
+    """Menu export and import testcase."""
+
+    def setUp(self):
+        """Create menu."""
+        menu = Menu.objects.create(name='main', depth=4)
+        index = Item.objects.create(menu=menu, name='Index', url='index')
+        i2 = Item.objects.create(menu=menu, name='I2', url='/i2',
+                                 parent=index, order=2)
+        Item.objects.create(menu=menu, name='I3', url='/i3', parent=i2,
+                            visibility='staff', permission='menu.change_menu')
+        Item.objects.create(menu=menu, name='Ext', url='http://example.com')
+        fd, self.filename = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, self.filename)
+
+    def items(self):
+        return sorted(Item.objects.values_list(
+            'menu__name', 'name', 'url', 'order', 'parent__url',
+            'visibility', 'permission'))
+
+    def write(self, records):
+        with open(self.filename, 'w') as output:
+            for record in records:
+                output.write(json.dumps(record) + '\n')
+
+    def test_round_trip(self):
+        """Exported menu is imported back."""
+        items = self.items()
+        call_command('menu_export', 'main', output=self.filename)
+        with open(self.filename) as source:
+            lines = [json.loads(line) for line in source]
+        self.assertEqual(lines[0], {'model': 'menu', 'name': 'main',
+                                    'depth': 4})
+        self.assertEqual(len(lines), 5)
+
+        with self.assertRaises(CommandError):
+            call_command('menu_import', self.filename)
+
+        with mock.patch('menu.management.commands.menu_import.validate_url') \
+                as validate:
+            call_command('menu_import', self.filename, replace=True,
+                         stdout=open(os.devnull, 'w'))
+        self.assertEqual(validate.call_count, 4)
+        self.assertEqual(self.items(), items)
+
+        i3 = Item.objects.get(url='/i3')
+        self.assertEqual(i3.path, '{}/{}/{}/'.format(
+            i3.parent.parent_id, i3.parent_id, i3.id))
+
+    def test_stdout(self):
+        """Export is written to command's stdout."""
+        output = StringIO()
+        call_command('menu_export', 'main', stdout=output)
+        lines = output.getvalue().splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(json.loads(lines[0])['name'], 'main')
+
+    def test_validate_once(self):
+        """Every distinct URL is checked once."""
+        self.write([{'model': 'item', 'menu': menu, 'name': 'Index',
+                     'url': 'index'} for menu in ('a', 'b', 'c')])
+        with mock.patch('menu.management.commands.menu_import.validate_url') \
+                as validate:
+            call_command('menu_import', self.filename,
+                         stdout=open(os.devnull, 'w'))
+        validate.assert_called_once_with('index')
+        self.assertEqual(Item.objects.filter(url='index').count(), 4)
+
+    def test_bad_data(self):
+        """Bad URLs and parents are reported before import."""
+        self.write([{'model': 'item', 'menu': 'new', 'name': 'Bad',
+                     'url': 'no-such-url'}])
+        with self.assertRaises(CommandError) as error:
+            call_command('menu_import', self.filename)
+        self.assertIn('no-such-url', str(error.exception))
+
+        self.write([{'model': 'item', 'menu': 'new', 'name': 'I2',
+                     'url': '/i2', 'parent': '/i3'}])
+        with self.assertRaises(CommandError) as error:
+            call_command('menu_import', self.filename)
+        self.assertIn('parents not found', str(error.exception))
+        self.assertFalse(Menu.objects.filter(name='new').exists())
+
+
+@override_settings(ROOT_URLCONF='tests.test_tags')
+class WarmTestCase(TestCase):
+    """Menu cache warm up testcase."""
+
+    def setUp(self):
+        """Create menu."""
+        cache.clear()
+        cache.get_backend().clear()
+        menu = Menu.objects.create(name='main', depth=4)
+        index = Item.objects.create(menu=menu, name='Index', url='index')
+        Item.objects.create(menu=menu, name='I2', url='/i2', parent=index)
+        Item.objects.create(menu=menu, name='Ext', url='http://example.com')
+
+    def test_warm(self):
+        """Menu is rendered once for every item and once for other pages."""
+        output = StringIO()
+        call_command('menu_warm', paths=['/i4', '/i5', '/nope'],
+                     tags=['draw_sql_menu'], workers=2, stdout=output)
+        self.assertIn('Rendered 3 menus for 4 pages', output.getvalue())
+        self.assertIn('1 paths not resolved, 0 errors', output.getvalue())
+
+        tree = cache.get_tree('main')
+        for path, url_name in (('/', 'index'), ('/i2', 'i2'), ('/i4', 'i4')):
+            key = cache.fragment_key(tree, ('draw_sql_menu', 'template', True),
+                                     tree.find_current(path, url_name))
+            self.assertIn('Index', cache.get_backend().get(key))
+
+    def test_no_menus(self):
+        with self.assertRaises(CommandError):
+            call_command('menu_warm', 'nope')
+
+    def test_site_menus(self):
+        """Menus of sites are skipped, pages are drawn without site."""
+        Menu.objects.create(name='main', site_id=2)
+        Menu.objects.create(name='own', site_id=2)
+        output = StringIO()
+        call_command('menu_warm', tags=['draw_sql_menu'], workers=2,
+                     stdout=output)
+        self.assertIn('Rendered 2 menus for 2 pages', output.getvalue())
+        self.assertIn('0 errors', output.getvalue())
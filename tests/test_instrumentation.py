@@ -0,0 +1,101 @@
+"""Menu instrumentation tests."""
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+try:
+    from io import StringIO
+except ImportError:
+    from StringIO import StringIO
+from django.core.management import call_command
+from django.test import TestCase, RequestFactory
+from django.template import Context, Template
+from django.test.utils import override_settings
+
+from menu import cache
+from menu import instrumentation
+from menu import utils
+from menu.models import Menu, Item
+
+
+@override_settings(ROOT_URLCONF='tests.test_tags')
+class InstrumentationTestCase(TestCase):
+    """Render stats testcase."""
+
+    def setUp(self):
+        """Create menu and connect stats receiver."""
+        cache.clear()
+        utils.clear_reversed()
+        self.factory = RequestFactory()
+        menu = Menu.objects.create(name='main')
+        index = Item.objects.create(menu=menu, name='Index', url='index')
+        Item.objects.create(menu=menu, name='I2', url='i2', parent=index)
+        self.stats = []
+        instrumentation.menu_rendered.connect(self.receiver)
+        self.addCleanup(instrumentation.menu_rendered.disconnect,
+                        self.receiver)
+
+    def receiver(self, sender, stats, **kwargs):
+        self.stats.append(stats)
+
+    def render(self, tag='draw_sql_menu'):
+        t = Template('{% load menus %}{% ' + tag + ' "main" %}')
+        t.render(Context({'request': self.factory.get('/')}))
+        return self.stats[-1]
+
+    def test_stats(self):
+        """Stats are sent for every render."""
+        stats = self.render()
+        self.assertEqual(stats.menu_name, 'main')
+        self.assertEqual(stats.tag, 'draw_sql_menu')
+        self.assertEqual(stats.items, 2)
+        self.assertEqual(stats.tree_cache, 'miss')
+        self.assertEqual(stats.queries, 2)
+        self.assertEqual(stats.reversed, 2)
+        self.assertIsNone(stats.fragment_cache)
+
+        stats = self.render('draw_orm_menu')
+        self.assertEqual(stats.tree_cache, 'hit')
+        self.assertEqual(stats.queries, 0)
+        self.assertEqual(stats.reversed, 0)
+
+    @override_settings(MENU_TREE_CACHE=False)
+    def test_query_stats(self):
+        """Queries are counted without tree cache."""
+        stats = self.render()
+        self.assertIsNone(stats.tree_cache)
+        self.assertEqual(stats.queries, 1)
+
+    @override_settings(MENU_STATS_INTERVAL=0)
+    def test_counters(self):
+        """Counters are aggregated and dumped by command."""
+        counters = instrumentation.Counters()
+        instrumentation.menu_rendered.connect(counters)
+        self.addCleanup(instrumentation.menu_rendered.disconnect, counters)
+        instrumentation.Counters.clear()
+
+        self.render()
+        self.render()
+        total = counters.snapshot()['main']
+        self.assertEqual(total['renders'], 2)
+        self.assertEqual(total['tree_hits'], 1)
+        self.assertEqual(total['tree_misses'], 1)
+        self.assertEqual(total['items'], 4)
+
+        out = StringIO()
+        call_command('menu_stats', '--reset', stdout=out)
+        self.assertIn('main', out.getvalue())
+        self.assertEqual(instrumentation.Counters.collect(), {})
+
+    def test_processes(self):
+        """Processes flush totals to own slots."""
+        instrumentation.Counters.clear()
+        processes = [instrumentation.Counters() for i in range(3)]
+        for counters in processes:
+            counters.totals['main'] = {'renders': 1}
+        for counters in processes:
+            counters.flush()
+        self.assertEqual(len(set(c.key for c in processes)), 3)
+        self.assertEqual(instrumentation.Counters.collect(),
+                         {'main': {'renders': 3}})
+        instrumentation.Counters.clear()
+        self.assertEqual(instrumentation.Counters.collect(), {})
@@ -0,0 +1,54 @@
+"""Menu preload middleware tests."""
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.http import HttpResponse
+from django.test import TransactionTestCase, RequestFactory
+from django.test.utils import override_settings
+
+from menu import cache
+from menu.models import Menu, Item
+
+
+@override_settings(ROOT_URLCONF='tests.urls_empty',
+                   MENU_PRELOAD=['main', 'second', 'none'])
+class MiddlewareTestCase(TransactionTestCase):
+    """Async menu preloading testcase."""
+
+    def setUp(self):
+        """Create menus."""
+        cache.clear()
+        self.factory = RequestFactory()
+        for name in ('main', 'second'):
+            menu = Menu.objects.create(name=name)
+            Item.objects.create(menu=menu, name=name, url='index')
+
+    def preload(self):
+        from asgiref.sync import async_to_sync
+        from menu.middleware import MenuPreloadMiddleware
+
+        async def view(request):
+            return HttpResponse()
+
+        request = self.factory.get('/')
+        middleware = MenuPreloadMiddleware(view)
+        with self.assertNumQueries(2):
+            async_to_sync(middleware)(request)
+        return request
+
+    def test_preload(self):
+        """Menus are loaded in thread with two queries."""
+        request = self.preload()
+        self.assertEqual(set(request._menu_trees), {'main', 'second', 'none'})
+        self.assertIsNone(request._menu_trees['none'])
+        second = request._menu_trees['second']
+        self.assertEqual([i.name for i in second.items.values()], ['second'])
+        with self.assertNumQueries(0):
+            cache.get_tree('main')
+
+    @override_settings(MENU_TREE_CACHE=False)
+    def test_preload_without_cache(self):
+        """Menus are loaded for request only."""
+        request = self.preload()
+        self.assertTrue(cache.has_tree(request, 'main'))
+        self.assertEqual(cache.lookup(['main'])[1], ['main'])
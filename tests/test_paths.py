@@ -0,0 +1,85 @@
+"""Materialized item path tests."""
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.core.exceptions import ValidationError
+from django.test import TestCase, RequestFactory
+from django.template import Context
+from django.test.utils import override_settings
+
+from menu.models import Menu, Item
+from menu.templatetags import menus
+
+
+@override_settings(ROOT_URLCONF='tests.test_tags', MENU_TREE_CACHE=False)
+class ItemPathTestCase(TestCase):
+    """Item path maintenance testcase."""
+
+    def setUp(self):
+        """Create menu with items."""
+        self.menu = Menu.objects.create(name='main')
+        self.root = Item.objects.create(menu=self.menu, name='Index', url='index')
+        self.i2 = Item.objects.create(menu=self.menu, name='I2', url='/i2',
+                                      parent=self.root)
+        self.i3 = Item.objects.create(menu=self.menu, name='I3', url='/i3',
+                                      parent=self.i2)
+        self.i4 = Item.objects.create(menu=self.menu, name='I4', url='/i4',
+                                      parent=self.i3)
+        self.other = Item.objects.create(menu=self.menu, name='I6', url='/i6')
+
+    def path(self, *items):
+        return ''.join('{}/'.format(i.pk) for i in items)
+
+    def test_create(self):
+        """Paths are set on create."""
+        self.assertEqual(Item.objects.get(pk=self.i4.pk).path,
+                         self.path(self.root, self.i2, self.i3, self.i4))
+
+    def test_move(self):
+        """Descendants' paths are changed on move."""
+        self.i2.parent = self.other
+        self.i2.save()
+        self.assertEqual(Item.objects.get(pk=self.i3.pk).path,
+                         self.path(self.other, self.i2, self.i3))
+        self.assertEqual(Item.objects.get(pk=self.i4.pk).path,
+                         self.path(self.other, self.i2, self.i3, self.i4))
+
+        # Outdated instance does not restore old path
+        self.i3.name = 'Renamed'
+        self.i3.save()
+        self.assertEqual(Item.objects.get(pk=self.i4.pk).path,
+                         self.path(self.other, self.i2, self.i3, self.i4))
+
+    def test_deep(self):
+        """Paths of deep menus with long ids are stored."""
+        parent = None
+        for i in range(1000000, 1000060):
+            parent = Item.objects.create(id=i, menu=self.menu, parent=parent,
+                                         name='I', url='/deep/{}'.format(i))
+        self.assertGreater(len(Item.objects.get(pk=parent.pk).path), 255)
+        self.assertEqual(Item._meta.get_field('path').max_length, None)
+
+    def test_cycle(self):
+        """Item can not be moved under its child."""
+        item = Item.objects.get(pk=self.i2.pk)
+        item.parent = self.i4
+        with self.assertRaises(ValidationError):
+            item.clean()
+
+    def test_rebuild(self):
+        """Paths are rebuilt after bulk changes."""
+        Item.objects.update(path='')
+        Item.rebuild_paths(self.menu.pk)
+        self.assertEqual(Item.objects.get(pk=self.i4.pk).path,
+                         self.path(self.root, self.i2, self.i3, self.i4))
+
+    def test_same_levels(self):
+        """Path tag gives the same levels as sql tag."""
+        factory = RequestFactory()
+        for path in ('/', '/i2', '/i3', '/i4', '/i5'):
+            context = Context({'request': factory.get(path)})
+            sql = menus.draw_sql_menu(context, 'main')['levels']
+            result = menus.draw_path_menu(context, 'main')['levels']
+            self.assertEqual(
+                [[(i['id'], i['url'], i['class']) for i in l] for l in result],
+                [[(i['id'], i['url'], i['class']) for i in l] for l in sql])
@@ -0,0 +1,72 @@
+"""Python menu renderer tests."""
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.test import TestCase, RequestFactory
+from django.template import Context, Template
+from django.test.utils import override_settings
+
+from menu import cache
+from menu.models import Menu, Item
+from menu.render import render_html
+
+
+@override_settings(ROOT_URLCONF='tests.urls_json')
+class RenderTestCase(TestCase):
+    """Python renderer gives the same HTML as menu template."""
+
+    def setUp(self):
+        """Create menu with names needing escaping."""
+        cache.clear()
+        self.factory = RequestFactory()
+        menu = Menu.objects.create(name='<main>')
+        index = Item.objects.create(menu=menu, name='Index & "home"',
+                                    url='index')
+        i2 = Item.objects.create(menu=menu, name='<b>I2</b>', url='/i2',
+                                 parent=index)
+        Item.objects.create(menu=menu, name="I3's", url='/i3', parent=i2)
+        Item.objects.create(menu=menu, name='I22', url='/i5?a=1&b=2',
+                            parent=index, order=1)
+        Item.objects.create(menu=menu, name='Ext',
+                            url='http://example.com/?q="x"')
+
+    def render(self, source, path, name=None):
+        template = Template('{% load menus %}' + source)
+        request = self.factory.get(path)
+        return template.render(Context({'request': request, 'name': name}))
+
+    def test_same_html(self):
+        """Output matches byte for byte for all tags and pages."""
+        source = '{% with menu_name=name %}{% TAG menu_name %}{% endwith %}'
+        for tag in ('draw_sql_menu', 'draw_orm_menu', 'draw_path_menu',
+                    'draw_lazy_menu'):
+            template = source.replace('TAG', tag)
+            python = template.replace('menu_name %}',
+                                      'menu_name renderer="python" %}')
+            for tree_cache in (True, False):
+                for name in ('<main>', 'none'):
+                    for path in ('/', '/i2', '/i3', '/i4', '/i5'):
+                        for wrap in ('{}', '{{% autoescape off %}}{}'
+                                           '{{% endautoescape %}}'):
+                            with override_settings(
+                                    MENU_TREE_CACHE=tree_cache):
+                                expected = self.render(
+                                    wrap.format(template), path, name)
+                                actual = self.render(
+                                    wrap.format(python), path, name)
+                            self.assertEqual(actual, expected)
+
+    def test_setting(self):
+        """Renderer is selected by setting."""
+        html = self.render('{% draw_sql_menu "<main>" %}', '/i2')
+        self.assertIn('&lt;b&gt;I2&lt;/b&gt;', html)
+        with override_settings(MENU_RENDERER='python'), \
+                self.assertTemplateNotUsed('menu/menu.html'):
+            self.assertEqual(
+                self.render('{% draw_sql_menu "<main>" %}', '/i2'), html)
+
+    def test_empty(self):
+        """Missing context renders empty menu like template."""
+        self.assertEqual(render_html(None),
+                         '<div id="menu-" class="menu">\n\n</div>\n'
+                         '<div class=\'menu-clear\'></div>\n')
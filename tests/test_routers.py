@@ -0,0 +1,148 @@
+"""Read replica router tests."""
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import io
+import os
+import tempfile
+import time
+try:
+    from unittest import mock
+except:
+    import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import router
+from django.db.models.signals import pre_save
+from django.template import Context, Template
+from django.test import RequestFactory, TransactionTestCase
+from django.test.utils import override_settings
+
+from menu import cache
+from menu import routers
+from menu.models import Menu, Item
+
+
+@override_settings(
+    ROOT_URLCONF='tests.urls_replica',
+    DATABASE_ROUTERS=['menu.routers.MenuRouter'],
+    MENU_REPLICA_DB='replica',
+    MENU_PRIMARY_WINDOW=10,
+    MENU_TREE_CACHE=False,
+    MIDDLEWARE=settings.MIDDLEWARE + [
+        'menu.middleware.MenuReplicaMiddleware'])
+class MenuRouterTestCase(TransactionTestCase):
+    """Menu reads go to replica, except after writes."""
+
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        """Create menu on primary and its lagging copy on replica."""
+        for using in ('default', 'replica'):
+            # Ids match, as replicated rows do
+            menu = Menu.objects.using(using).create(id=1, name='main')
+            Item.objects.using(using).bulk_create([
+                Item(id=1, menu=menu, name='Index', url='index'),
+                Item(id=2, menu=menu, name='I2', url='/i2', parent_id=1)])
+        self.unpin()
+
+    def unpin(self):
+        routers._pinned_until[0] = 0.0
+
+    def names(self):
+        response = self.client.get('/menus/main.json', {'path': '/i2'})
+        return [item['name'] for level in response.json()['levels']
+                for item in level]
+
+    def render(self):
+        template = Template('{% load menus %}{% draw_sql_menu "main" %}')
+        return template.render(
+            Context({'request': RequestFactory().get('/i2')}))
+
+    def test_routing(self):
+        """Reads go to replica, writes to primary."""
+        self.assertEqual(router.db_for_read(Item), 'replica')
+        self.assertEqual(router.db_for_write(Item), 'default')
+        self.assertIsNone(routers.MenuRouter().db_for_read(User))
+        item = Item.objects.get(pk=2)
+        self.assertEqual(item._state.db, 'replica')
+        self.assertEqual(item.menu._state.db, 'replica')
+        with routers.use_primary():
+            self.assertEqual(router.db_for_read(Item), 'default')
+        with self.settings(MENU_REPLICA_DB=None):
+            self.assertEqual(router.db_for_read(Item), 'default')
+
+    def test_tags(self):
+        """Tags read replica."""
+        Item.objects.using('replica').filter(pk=2).update(name='Replica')
+        self.assertIn('Replica', self.render())
+        with self.assertNumQueries(0, using='default'):
+            self.render()
+
+    def test_sticky(self):
+        """Client which changed menu reads primary for a while."""
+        self.client.get('/rename/2', {'name': 'Changed'})
+        self.unpin()
+        self.assertIn('Changed', self.names())
+        self.assertNotIn('Changed', self.client_class().get(
+            '/menus/main.json', {'path': '/i2'}).content.decode('utf-8'))
+
+        with mock.patch('time.time', return_value=time.time() + 11):
+            self.assertNotIn('Changed', self.names())
+
+    def test_process_pin(self):
+        """Trees cached after changes are loaded from primary."""
+        with self.settings(MENU_TREE_CACHE=True):
+            cache.clear()
+            Item.objects.filter(pk=2).update(name='Changed')
+            cache.menu_changed('main', 1)
+            self.assertIn('Changed', self.render())
+            self.unpin()
+            cache._trees.clear()
+            self.assertNotIn('Changed', self.render())
+
+    @override_settings(MENU_PRIMARY_DB='replica', MENU_REPLICA_DB='default')
+    def test_save(self):
+        """Item is saved in transaction of primary, reads are pinned."""
+        pinned = []
+
+        def receiver(sender, **kwargs):
+            pinned.append(routers.is_pinned())
+
+        pre_save.connect(receiver, sender=Item)
+        self.addCleanup(pre_save.disconnect, receiver, sender=Item)
+        item = Item.objects.get(pk=2)
+        item.name = 'Changed'
+        item.save()
+        self.assertEqual(pinned, [True])
+        self.assertEqual(Item.objects.using('replica').get(pk=2).name,
+                         'Changed')
+
+    def test_move_and_publish(self):
+        """Moves and snapshots read items on primary."""
+        Item.objects.using('replica').filter(pk=2).delete()
+        menu = Menu.objects.get(pk=1)
+        menu.move_items([(2, None, 1)])
+        self.assertIsNone(Item.objects.using('default').get(pk=2).parent_id)
+        snapshot = menu.publish()
+        self.assertEqual(snapshot._state.db, 'default')
+        self.assertIn('I2', snapshot.data)
+        menu.rollback(1)
+        self.assertEqual(
+            Menu.objects.using('default').get(pk=1).published_id, snapshot.id)
+
+    @override_settings(MENU_PRIMARY_DB='replica', MENU_REPLICA_DB='default')
+    def test_import(self):
+        """Import replaces items on primary in its transaction."""
+        fd, filename = tempfile.mkstemp()
+        self.addCleanup(os.remove, filename)
+        with os.fdopen(fd, 'w') as output:
+            output.write('{"model": "item", "menu": "main", '
+                         '"name": "New", "url": "/new"}\n')
+        call_command('menu_import', filename, replace=True,
+                     skip_validation=True, stdout=io.StringIO())
+        self.assertEqual(list(Item.objects.using('replica')
+                              .values_list('name', flat=True)), ['New'])
+        self.assertEqual(Item.objects.using('default').count(), 2)
@@ -0,0 +1,98 @@
+"""Query plan tests for menu lookups."""
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import re
+import unittest
+
+from django.db import connection
+from django.test import TestCase, RequestFactory
+from django.template import Context, Template
+from django.test.utils import CaptureQueriesContext
+from django.test.utils import override_settings
+
+from menu import cache
+from menu.models import Menu, Item
+
+
+# Full table scans of menu tables
+FULL_SCANS = {
+    'sqlite': re.compile(r'^SCAN (TABLE )?menu_(menu|item)\b(?! USING)'),
+    'postgresql': re.compile(r'Seq Scan on menu_(menu|item)\b'),
+}
+
+
+@unittest.skipUnless(connection.vendor in FULL_SCANS,
+                     'Query plans are checked on SQLite and PostgreSQL')
+@override_settings(ROOT_URLCONF='tests.test_tags')
+class QueryPlanTestCase(TestCase):
+    """Menu queries use indexes."""
+
+    def setUp(self):
+        """Create menus."""
+        cache.clear()
+        self.factory = RequestFactory()
+        for name in ('main', 'second'):
+            menu = Menu.objects.create(name=name)
+            index = Item.objects.create(menu=menu, name='Index', url='index')
+            i2 = Item.objects.create(menu=menu, name='I2', url='/i2',
+                                     parent=index)
+            Item.objects.create(menu=menu, name='I3', url='/i3', parent=i2)
+
+    def explain(self, sql, params):
+        """Return query plan lines."""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                return [row[-1] for row in cursor.fetchall()]
+            # Small tables are scanned by PostgreSQL anyway
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('EXPLAIN ' + sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+    def assertNoFullScans(self, queries):
+        self.assertTrue(queries.captured_queries)
+        full_scan = FULL_SCANS[connection.vendor]
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith(('SELECT', 'UPDATE')):
+                continue
+            # Captured SQL has params already quoted
+            for line in self.explain(sql, ()):
+                self.assertIsNone(full_scan.search(line.strip()),
+                                  '{}\n{}'.format(sql, line))
+
+    def render(self, template):
+        t = Template('{% load menus %}' + template)
+        with CaptureQueriesContext(connection) as queries:
+            t.render(Context({'request': self.factory.get('/i2')}))
+        return queries
+
+    def test_tree_load(self):
+        """Cached tree is loaded by menu name and id."""
+        self.assertNoFullScans(self.render('{% draw_sql_menu "main" %}'))
+
+    def test_load_menus(self):
+        """Several menus are loaded by names and ids."""
+        self.assertNoFullScans(self.render('{% load_menus "main" "second" %}'))
+
+    @override_settings(MENU_SITES=True, SITE_ID=2)
+    def test_site_menus(self):
+        """Site's menus are loaded by name and site."""
+        Menu.objects.create(name='main', site_id=2)
+        self.assertNoFullScans(self.render('{% load_menus "main" "second" %}'))
+
+    @override_settings(MENU_TREE_CACHE=False)
+    def test_path_menu(self):
+        """Path tag uses indexes only."""
+        self.assertNoFullScans(self.render('{% draw_path_menu "main" %}'))
+
+    @unittest.skipUnless(connection.vendor == 'postgresql',
+                         'SQLite LIKE is case insensitive and not indexed')
+    def test_move(self):
+        """Descendants' paths are changed by indexed prefix."""
+        item = Item.objects.get(menu__name='main', url='/i2')
+        item.parent = None
+        with CaptureQueriesContext(connection) as queries:
+            item.save()
+        self.assertNoFullScans(queries)
@@ -0,0 +1,128 @@
+"""Menu sitemap tests."""
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+try:
+    from unittest import mock
+except:
+    import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from menu.models import Menu, Item
+from menu.sitemaps import MenuSitemap, MenuURLs
+
+
+@override_settings(ROOT_URLCONF='tests.urls_sitemap')
+class SitemapTestCase(TestCase):
+    """Sitemap of distinct internal URLs of all menus."""
+
+    def setUp(self):
+        """Create menus sharing URLs."""
+        main = Menu.objects.create(name='main')
+        footer = Menu.objects.create(name='footer')
+        Item.objects.create(menu=main, name='Index', url='index')
+        Item.objects.create(menu=main, name='I2', url='/i2')
+        Item.objects.create(menu=main, name='I3', url='/i3?a=1&b=2')
+        Item.objects.create(menu=main, name='Ext', url='http://example.com')
+        Item.objects.create(menu=footer, name='Home', url='/')
+        Item.objects.create(menu=footer, name='I2', url='i2')
+        Item.objects.create(menu=footer, name='I4', url='/i4')
+        Item.objects.create(menu=footer, name='Bad', url='nope')
+        self.paths = ['/', '/i2', '/i3?a=1&b=2', '/i4']
+
+    def test_urls(self):
+        """URLs are distinct, sliced and counted like iterated."""
+        urls = MenuURLs(chunk_size=1)
+        self.assertEqual(list(urls), self.paths)
+        self.assertEqual(len(urls), 4)
+        for start in range(5):
+            for stop in range(start, 6):
+                self.assertEqual(urls[start:stop],
+                                 self.paths[start:stop])
+        self.assertEqual(list(MenuURLs(['footer'])), ['/i2', '/', '/i4'])
+
+    def test_old_django(self):
+        """Paths are read without chunk size before Django 2.0."""
+        with mock.patch('django.VERSION', (1, 11, 0, 'final', 0)), \
+                mock.patch('django.db.models.QuerySet.iterator',
+                           autospec=True,
+                           side_effect=lambda qs: iter(list(qs))) as iterator:
+            self.assertEqual(list(MenuURLs()), self.paths)
+        iterator.assert_called_once_with(mock.ANY)
+
+    def test_sitemap(self):
+        """Sitemap class works with django.contrib.sitemaps."""
+        sitemap = MenuSitemap()
+        sitemap.limit = 3
+        self.assertEqual(sitemap.paginator.num_pages, 2)
+        urls = sitemap.get_urls(page=2, site=mock.Mock(domain='example.com'),
+                                protocol='https')
+        self.assertEqual([url['location'] for url in urls],
+                         ['https://example.com/i4'])
+
+    def test_view(self):
+        """Big sitemaps are split into pages listed by index."""
+        response = self.client.get('/sitemap.xml')
+        content = b''.join(response.streaming_content).decode('utf-8')
+        self.assertIn('<loc>http://testserver/i3?a=1&amp;b=2</loc>', content)
+        self.assertEqual(content.count('<url>'), 4)
+
+        response = self.client.get('/main.xml')
+        content = b''.join(response.streaming_content).decode('utf-8')
+        self.assertEqual(content.count('<url>'), 3)
+
+        with mock.patch('menu.sitemaps.MAX_URLS', 3):
+            response = self.client.get('/sitemap.xml')
+            content = b''.join(response.streaming_content).decode('utf-8')
+            self.assertIn('<sitemapindex', content)
+            self.assertIn('<loc>http://testserver/sitemap.xml?p=2</loc>',
+                          content)
+            self.assertNotIn('?p=3', content)
+
+            response = self.client.get('/sitemap.xml', {'p': 2})
+            content = b''.join(response.streaming_content).decode('utf-8')
+            self.assertIn('<loc>http://testserver/i4</loc>', content)
+            self.assertEqual(content.count('<url>'), 1)
+        self.assertEqual(self.client.get('/sitemap.xml', {'p': 0})
+                         .status_code, 404)
+
+    def test_command(self):
+        """Files are split by URLs and bytes limits."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+
+        def read(name):
+            with open(os.path.join(directory, name)) as source:
+                return source.read()
+
+        def write(*args):
+            for name in os.listdir(directory):
+                os.remove(os.path.join(directory, name))
+            call_command('menu_sitemap', '--base-url', 'https://e.com/',
+                         '--output-dir', directory, *args,
+                         stdout=open(os.devnull, 'w'))
+            return sorted(os.listdir(directory))
+
+        self.assertEqual(write(), ['sitemap.xml'])
+        self.assertEqual(read('sitemap.xml').count('<url>'), 4)
+
+        self.assertEqual(write('--max-urls', '3'),
+                         ['sitemap-1.xml', 'sitemap-2.xml', 'sitemap.xml'])
+        self.assertIn('<loc>https://e.com/sitemap-2.xml</loc>',
+                      read('sitemap.xml'))
+        self.assertEqual(read('sitemap-2.xml').count('<url>'), 1)
+
+        files = write('--max-bytes', '250')
+        self.assertEqual(len(files), 3)
+        for name in files[:-1]:
+            self.assertLessEqual(len(read(name)), 250)
+
+        Item.objects.all().delete()
+        self.assertEqual(write(), ['sitemap.xml'])
+        self.assertIn('<urlset', read('sitemap.xml'))
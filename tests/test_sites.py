@@ -0,0 +1,106 @@
+"""Per-site menus tests."""
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+try:
+    from unittest import mock
+except:
+    import mock
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError
+from django.test import TestCase, RequestFactory
+from django.template import Context, Template
+from django.test.utils import override_settings
+
+from menu import cache
+from menu.models import Menu, Item
+from menu.tree import MenuTree
+
+
+@override_settings(ROOT_URLCONF='tests.test_tags', MENU_SITES=True,
+                   MENU_CACHE=True)
+class SiteMenuTestCase(TestCase):
+    """Site's own menus override menus for all sites."""
+
+    def setUp(self):
+        """Create menu for all sites and menu of site 2."""
+        cache.clear()
+        self.factory = RequestFactory()
+        self.menu = Menu.objects.create(name='main')
+        Item.objects.create(menu=self.menu, name='Common', url='/i2')
+        self.own = Menu.objects.create(name='main', site_id=2)
+        Item.objects.create(menu=self.own, name='Own', url='/i2')
+
+    def render(self, site_id, tag='draw_sql_menu'):
+        template = Template('{% load menus %}{% ' + tag + ' "main" %}')
+        request = self.factory.get('/i2')
+        request.site = mock.Mock(id=site_id)
+        return template.render(Context({'request': request}))
+
+    def test_override(self):
+        """Sites without own menu draw menu for all sites."""
+        self.assertIn('Own', self.render(2))
+        self.assertIn('Common', self.render(1))
+        with self.assertNumQueries(0):
+            self.assertIn('Own', self.render(2))
+            self.assertIn('Common', self.render(1))
+        with self.settings(MENU_SITES=False):
+            cache.clear()
+            self.assertIn('Common', self.render(2))
+
+    def test_load_many(self):
+        """Menus of several sites are loaded together."""
+        trees = MenuTree.load_many([(1, 'main'), (2, 'main'), 'main',
+                                    (2, 'none')])
+        self.assertEqual(trees[(1, 'main')].menu_id, self.menu.id)
+        self.assertEqual(trees[(2, 'main')].menu_id, self.own.id)
+        self.assertEqual(trees[(2, 'main')].site_id, 2)
+        self.assertEqual(trees['main'].menu_id, self.menu.id)
+        self.assertIsNone(trees[(2, 'none')])
+
+    def test_versions(self):
+        """Site's menu changes keep other sites' rendered menus."""
+        self.render(1)
+        self.render(2)
+        common = cache.get_version((1, 'main'))
+        own = cache.get_version((2, 'main'))
+
+        Item.objects.create(menu=self.own, name='New', url='/i3')
+        self.assertEqual(cache.get_version((1, 'main')), common)
+        self.assertNotEqual(cache.get_version((2, 'main')), own)
+        self.assertIn('New', self.render(2))
+
+        own = cache.get_version((2, 'main'))
+        Item.objects.create(menu=self.menu, name='Other', url='/i3')
+        self.assertNotEqual(cache.get_version((1, 'main')), common)
+        self.assertNotEqual(cache.get_version((2, 'main')), own)
+        self.assertIn('Other', self.render(1))
+
+    def test_site_created(self):
+        """New site's menu replaces cached menu for all sites."""
+        self.assertIn('Common', self.render(3))
+        Menu.objects.create(name='main', site_id=3)
+        self.assertNotIn('Common', self.render(3))
+
+    def test_unique(self):
+        """Names are unique per site and among menus for all sites."""
+        with self.assertRaises(ValidationError):
+            Menu(name='main').full_clean()
+        with self.assertRaises(ValidationError):
+            Menu(name='main', site_id=2).full_clean()
+        Menu(name='main', site_id=3).full_clean()
+
+    @override_settings(MENU_TREE_CACHE=False)
+    def test_not_cached(self):
+        """Tags reading database draw menu for all sites only."""
+        for tag in ('draw_sql_menu', 'draw_orm_menu', 'draw_path_menu',
+                    'draw_lazy_menu'):
+            html = self.render(2, tag)
+            self.assertIn('Common', html, tag)
+            self.assertNotIn('Own', html, tag)
+
+    def test_unique_in_database(self):
+        """Database refuses second menu for all sites with same name."""
+        with self.assertRaises(IntegrityError):
+            Menu.objects.create(name='main')
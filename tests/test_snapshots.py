@@ -0,0 +1,87 @@
+"""Published menu snapshots tests."""
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+try:
+    from unittest import mock
+except:
+    import mock
+
+from django.test import TestCase, RequestFactory
+from django.template import Context, Template
+from django.test.utils import override_settings
+
+from menu import cache
+from menu.models import Menu, Item, Snapshot
+from menu.tree import MenuTree
+
+
+def run_on_commit(func, using=None):
+    func()
+
+
+@override_settings(ROOT_URLCONF='tests.test_tags', MENU_SNAPSHOTS=True)
+@mock.patch('django.db.transaction.on_commit', run_on_commit)
+class SnapshotTestCase(TestCase):
+    """Menu snapshot publish and rollback testcase."""
+
+    def setUp(self):
+        """Create menu with items."""
+        cache.clear()
+        self.menu = Menu.objects.create(name='main', depth=2)
+        self.index = Item.objects.create(menu=self.menu, name='Index',
+                                         url='index')
+        Item.objects.create(menu=self.menu, name='I2', url='/i2',
+                            parent=self.index)
+
+    def render(self, path='/i2'):
+        template = Template('{% load menus %}{% draw_sql_menu "main" %}')
+        request = RequestFactory().get(path)
+        return template.render(Context({'request': request}))
+
+    def test_publish(self):
+        """Published items are drawn until next publish."""
+        html = self.render()
+        snapshot = self.menu.publish()
+        self.assertEqual(snapshot.version, 1)
+        self.assertEqual(json.loads(snapshot.data)['items'], [
+            [self.index.id, None, 'Index', 'index', 0],
+            [self.index.id + 1, self.index.id, 'I2', '/i2', 0]])
+
+        Item.objects.create(menu=self.menu, name='I3', url='/i3',
+                            parent=self.index)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.render(), html)
+
+        self.assertEqual(self.menu.publish().version, 2)
+        self.assertIn('I3', self.render())
+
+        self.menu.rollback(1)
+        self.assertEqual(self.render(), html)
+        self.assertEqual(Menu.objects.get().published.version, 1)
+
+    def test_not_published(self):
+        """Menus without snapshot and with snapshots off draw items."""
+        self.assertIsNone(MenuTree.from_snapshot(
+            Menu.objects.select_related('published').get()))
+        self.menu.publish()
+        Item.objects.create(menu=self.menu, name='I3', url='/i3',
+                            parent=self.index)
+        with self.settings(MENU_SNAPSHOTS=False):
+            cache.clear()
+            self.assertIn('I3', self.render())
+
+        Snapshot.objects.all().delete()
+        self.assertIn('I3', self.render())
+
+    def test_load_many(self):
+        """Menus with and without snapshots are loaded together."""
+        self.menu.publish()
+        other = Menu.objects.create(name='other')
+        Item.objects.create(menu=other, name='O', url='/o')
+        with self.assertNumQueries(2):
+            trees = MenuTree.load_many(['main', 'other', 'nope'])
+        self.assertEqual(len(trees['main'].items), 2)
+        self.assertEqual(len(trees['other'].items), 1)
+        self.assertIsNone(trees['nope'])
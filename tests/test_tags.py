@@ -12,6 +12,7 @@ from django.template import Context, Template
 from django.conf.urls import url
 from django.test.utils import override_settings
 
+from menu import cache
 from menu.models import Menu, Item
 
 
@@ -32,6 +33,7 @@ class MenuTestCase(TestCase):
 
     def setUp(self):
         """Create menus and menu items."""
+        cache.clear()
         self.factory = RequestFactory()
         menu1 = Menu.objects.create(name='main', depth=5)
         menu2 = Menu.objects.create(name='second')
@@ -51,6 +53,7 @@ class MenuTestCase(TestCase):
             Item(id=62, menu=menu1, name='I62', url='/i62', parent_id=6),
             Item(id=8, menu=menu2, name='I8', url='/i8'),
         ])
+        Item.rebuild_paths()
 
     def check_menu(self, template):
         """Test results for both tags."""
@@ -107,3 +110,42 @@ class MenuTestCase(TestCase):
         t = Template('{% load menus %}{% draw_orm_menu "main" %}')
         self.check_menu(t)
         self.check_last_menu_item(t)
+
+    @override_settings(MENU_TREE_CACHE=False)
+    def test_sql_menu_without_cache(self):
+        """Test sql menu tag with database query."""
+        self.test_sql_menu()
+
+    @override_settings(MENU_TREE_CACHE=False)
+    def test_orm_menu_without_cache(self):
+        """Test orm menu tag with database query."""
+        self.test_orm_menu()
+
+    @override_settings(MENU_TREE_CACHE=False)
+    def test_path_menu(self):
+        """Test path menu tag."""
+        t = Template('{% load menus %}{% draw_path_menu "main" %}')
+        self.check_menu(t)
+        self.check_last_menu_item(t)
+
+    def render_menus(self, queries):
+        """Render two menus loaded with load_menus tag."""
+        t = Template('{% load menus %}{% load_menus "main" "second" "none" %}'
+                     '{% draw_sql_menu "main" %}{% draw_orm_menu "second" %}'
+                     '{% draw_path_menu "none" %}')
+        with self.assertNumQueries(queries):
+            rendered_page = t.render(Context({"request": self.factory.get('/i3')}))
+        self.assertInHTML('<li class="current">I3</li>', rendered_page)
+        self.assertInHTML('<li class="root"><a href="/i8">I8</a></li>', rendered_page)
+
+    @override_settings(MENU_TREE_CACHE=False)
+    def test_load_menus(self):
+        """Test several menus loaded with one items query."""
+        # Menus and items queries on every page
+        self.render_menus(2)
+        self.render_menus(2)
+
+    def test_load_menus_cached(self):
+        """Test several menus loaded with one query into tree cache."""
+        self.render_menus(2)
+        self.render_menus(0)
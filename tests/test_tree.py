@@ -0,0 +1,159 @@
+"""Menu tree builder tests."""
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import random
+import sys
+from itertools import groupby
+
+from django.test import SimpleTestCase
+from django.test.utils import override_settings
+from django.urls import set_script_prefix
+
+from menu.tree import MenuTree, Node
+from menu.utils import reverse_url
+
+
+def recursive_levels(nodes, current_path, current_url_name):
+    """Levels built by former recursive builder of draw_orm_menu."""
+    items = sorted(({'id': n.id, 'parent_id': n.parent_id, 'url': n.url,
+                     'order': n.order} for n in nodes),
+                   key=lambda x: (x['parent_id'] or 0, x['order'], x['id']))
+    dict_menu = dict()
+    for parent, menu_level in groupby(items, key=lambda x: x['parent_id']):
+        dict_menu[parent] = list(menu_level)
+    result_menu = []
+
+    def get_children(node, item_class=None):
+        current_level = dict_menu.get(node)
+        for item in current_level:
+            item['url'] = reverse_url(item['url'])
+            if item_class:
+                item['class'] = item_class
+            elif item['url'] == current_url_name or \
+                    item['url'] == current_path:
+                item['class'] = 'current'
+                if dict_menu.get(item['id']):
+                    get_children(item['id'], item_class='child')
+            elif dict_menu.get(item['id']):
+                item['class'] = 'selected'
+                get_children(item['id'])
+            elif not item['parent_id']:
+                item['class'] = 'root'
+            else:
+                item['class'] = 'neighbour'
+        result_menu.append(current_level)
+
+    get_children(None)
+    result_menu.reverse()
+    return [[(i['id'], i['url'], i['class']) for i in level]
+            for level in result_menu]
+
+
+def expanded(nodes, current_id):
+    """Root items and children of current item and its parents,
+    as orm tag loads them."""
+    parents = dict((n.id, n.parent_id) for n in nodes)
+    branch = set()
+    while current_id is not None:
+        branch.add(current_id)
+        current_id = parents[current_id]
+    return [n for n in nodes if n.parent_id is None or n.parent_id in branch]
+
+
+def levels(tree, path):
+    return [[(i.id, i.url, i['class']) for i in level]
+            for level in tree.get_levels(path, None)]
+
+
+@override_settings(ROOT_URLCONF='tests.urls_empty')
+class MenuTreeTestCase(SimpleTestCase):
+    """Iterative builder gives levels of former recursive builder."""
+
+    def random_nodes(self, size):
+        nodes = []
+        for i in range(1, size + 1):
+            parent_id = random.choice([None] + [n.id for n in nodes[-10:]])
+            nodes.append(Node(i, 1, parent_id, 'I{}'.format(i),
+                              '/i{}'.format(i), random.randint(0, 3)))
+        return nodes
+
+    def test_same_levels(self):
+        random.seed(0)
+        for size in (1, 2, 5, 20, 100):
+            nodes = self.random_nodes(size)
+            tree = MenuTree(nodes)
+            for node in nodes + [Node(0, 1, None, '', '/none', 0)]:
+                subset = expanded(nodes, node.id or None)
+                self.assertEqual(levels(tree, node.url),
+                                 recursive_levels(subset, node.url, None))
+                self.assertEqual(levels(MenuTree(subset), node.url),
+                                 levels(tree, node.url))
+
+    def test_shared_nodes(self):
+        """Tree nodes are not changed by builder."""
+        nodes = self.random_nodes(20)
+        tree = MenuTree(list(nodes))
+        levels(tree, '/i20')
+        self.assertEqual(sorted(tree.items.values()), nodes)
+
+    def test_deep_menu(self):
+        """Menu deeper than recursion limit is built."""
+        size = sys.getrecursionlimit() * 2
+        nodes = [Node(i, 1, i - 1 or None, 'I{}'.format(i),
+                      '/i{}'.format(i), 0) for i in range(1, size + 1)]
+        result = levels(MenuTree(nodes), '/i{}'.format(size - 1))
+        self.assertEqual(len(result), size)
+        self.assertEqual(result[-2], [(size - 1, '/i{}'.format(size - 1),
+                                       'current')])
+        self.assertEqual(result[-1][0][2], 'child')
+
+    def test_cycle(self):
+        """Items with parent cycle are not expanded."""
+        nodes = [Node(1, 1, None, 'I1', '/i1', 0),
+                 Node(2, 1, 3, 'I2', '/i2', 0),
+                 Node(3, 1, 2, 'I3', '/i3', 0)]
+        self.assertEqual(levels(MenuTree(nodes), '/i2'),
+                         [[(1, '/i1', 'root')]])
+
+
+@override_settings(ROOT_URLCONF='tests.test_tags', MENU_PREFIX_MATCH=True)
+class MenuPrefixTestCase(SimpleTestCase):
+    """Longest prefix matching of current item."""
+
+    def setUp(self):
+        self.tree = MenuTree([
+            Node(1, 1, None, 'Index', 'index', 0),
+            Node(2, 1, None, 'Blog', '/blog/', 1),
+            Node(3, 1, 2, 'Year', '/blog/2024', 0),
+            Node(4, 1, None, 'I2', 'i2', 2),
+            Node(5, 1, None, 'Ext', 'http://example.com/blog/2024/x', 3),
+        ])
+
+    def test_prefix(self):
+        """Deepest item with URL prefixing the path is current."""
+        find = self.tree.find_current
+        self.assertEqual(find('/blog/2024/some-post', None), 3)
+        self.assertEqual(find('/blog/2023/some-post', None), 2)
+        self.assertEqual(find('/blog', None), 2)
+        self.assertEqual(find('/blogs/2024', None), None)
+        self.assertEqual(find('/i2/comments/', None), 4)
+        # Root item is matched only exactly
+        self.assertEqual(find('/about', None), None)
+        self.assertEqual(find('/', 'index'), 1)
+        with override_settings(MENU_PREFIX_MATCH=False):
+            self.assertEqual(find('/blog/2024/some-post', None), None)
+
+        self.assertEqual(levels(self.tree, '/blog/2024/some-post'), [
+            [(1, '/', 'root'), (2, '/blog/', 'selected'),
+             (4, '/i2', 'root'), (5, 'http://example.com/blog/2024/x',
+                                  'root')],
+            [(3, '/blog/2024', 'current')]])
+
+    def test_script_prefix(self):
+        """Reversed URLs are matched without script prefix."""
+        set_script_prefix('/site/')
+        self.addCleanup(set_script_prefix, '/')
+        self.assertEqual(self.tree.find_current('/i2/comments', None), 4)
+        self.assertEqual(self.tree.find_current('/blog/1', None), 2)
+        self.assertEqual(len(self.tree.tries), 1)
@@ -0,0 +1,57 @@
+"""URL helpers tests."""
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+try:
+    from unittest import mock
+except:
+    import mock
+from django.test import TestCase, RequestFactory
+from django.template import Context, Template
+from django.test.utils import override_settings
+
+from menu import cache
+from menu import utils
+from menu.models import Menu, Item
+
+
+@override_settings(ROOT_URLCONF='tests.test_tags')
+class UtilsTestCase(TestCase):
+    """URL reverse and resolve testcase."""
+
+    def setUp(self):
+        """Create menu with named URLs."""
+        cache.clear()
+        self.factory = RequestFactory()
+        menu = Menu.objects.create(name='main')
+        index = Item.objects.create(menu=menu, name='Index', url='index')
+        Item.objects.create(menu=menu, name='I2', url='i2', parent=index)
+        Item.objects.create(menu=menu, name='Bad', url='bad', parent=index)
+
+    def test_reverse_cached(self):
+        """Named URLs are reversed once."""
+        t = Template('{% load menus %}{% draw_sql_menu "main" %}')
+        t.render(Context({'request': self.factory.get('/')}))
+        with mock.patch('menu.utils.reverse') as reverse:
+            rendered_page = t.render(
+                Context({'request': self.factory.get('/')}))
+        self.assertFalse(reverse.called)
+        self.assertInHTML('<li class="child"><a href="/i2">I2</a></li>',
+                          rendered_page)
+        self.assertInHTML('<li class="child"><a href="#">Bad</a></li>',
+                          rendered_page)
+
+    def test_reverse_urlconf_changed(self):
+        """Cached URLs are dropped when URLconf is changed."""
+        self.assertEqual(utils.reverse_url('i2'), '/i2')
+        with override_settings(ROOT_URLCONF='tests.urls_empty'):
+            self.assertEqual(utils.reverse_url('i2'), '#')
+        self.assertEqual(utils.reverse_url('i2'), '/i2')
+
+    def test_resolve_once(self):
+        """Current URL is resolved once for all tags on page."""
+        t = Template('{% load menus %}{% draw_sql_menu "main" %}'
+                     '{% draw_orm_menu "main" %}')
+        with mock.patch('menu.utils.resolve', wraps=utils.resolve) as resolve:
+            t.render(Context({'request': self.factory.get('/i2')}))
+        self.assertEqual(resolve.call_count, 1)
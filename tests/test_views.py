@@ -0,0 +1,174 @@
+"""Menu JSON view tests."""
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+try:
+    from unittest import mock
+except:
+    import mock
+
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from menu import cache
+from menu import views
+from menu.models import Menu, Item
+from menu.templatetags import menus
+
+
+@override_settings(ROOT_URLCONF='tests.urls_json')
+class MenuJSONTestCase(TestCase):
+    """Menu JSON with conditional GET testcase."""
+
+    def setUp(self):
+        """Create menu with items."""
+        cache.clear()
+        self.menu = Menu.objects.create(name='main')
+        self.index = Item.objects.create(menu=self.menu, name='Index',
+                                         url='index')
+        self.i2 = Item.objects.create(menu=self.menu, name='I2', url='/i2',
+                                      parent=self.index)
+        self.url = reverse('menu:menu_json', args=['main'])
+
+    def test_levels(self):
+        """Levels are the same as tags draw."""
+        response = self.client.get(self.url, {'path': '/i2'})
+        self.assertEqual(response.json(), {
+            'menu_name': 'main',
+            'levels': [
+                [{'id': self.index.id, 'parent_id': None, 'name': 'Index',
+                  'url': '/', 'class': 'selected'}],
+                [{'id': self.i2.id, 'parent_id': self.index.id, 'name': 'I2',
+                  'url': '/i2', 'class': 'current'}],
+            ]})
+        self.assertIn('public', response['Cache-Control'])
+
+        response = self.client.get(self.url, {'path': '/nope'})
+        self.assertEqual(len(response.json()['levels']), 1)
+
+        response = self.client.get(reverse('menu:menu_json', args=['nope']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_not_modified(self):
+        """Unchanged menu is answered with 304 without queries."""
+        response = self.client.get(self.url, {'path': '/i2'})
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, {'path': '/i2'},
+                                       HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        # Other current item and changed menu have other tags
+        response = self.client.get(self.url, {'path': '/'},
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.i2.name = 'Page'
+        self.i2.save()
+        response = self.client.get(self.url, {'path': '/i2'},
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_without_tree_cache(self):
+        """Tag changes with version when trees are not cached."""
+        with override_settings(MENU_TREE_CACHE=False):
+            first = self.client.get(self.url)['ETag']
+            self.assertEqual(self.client.get(self.url)['ETag'], first)
+            self.i2.save()
+            self.assertNotEqual(self.client.get(self.url)['ETag'], first)
+
+
+@override_settings(ROOT_URLCONF='tests.urls_json')
+class LazyMenuTestCase(TestCase):
+    """Lazy menu tag and children JSON testcase."""
+
+    def setUp(self):
+        """Create menu with collapsed subtrees."""
+        cache.clear()
+        self.menu = Menu.objects.create(name='main')
+        self.index = Item.objects.create(menu=self.menu, name='Index',
+                                         url='index')
+        self.i2 = Item.objects.create(menu=self.menu, name='I2', url='/i2',
+                                      parent=self.index)
+        self.i3 = Item.objects.create(menu=self.menu, name='I3', url='/i3',
+                                      parent=self.i2)
+        self.i4 = Item.objects.create(menu=self.menu, name='I4', url='/i4',
+                                      order=1)
+        Item.objects.create(menu=self.menu, name='I41', url='/i41',
+                            parent=self.i4)
+        self.template = Template('{% load menus %}{% draw_lazy_menu "main" %}')
+
+    def levels(self, path):
+        context = Context({'request': RequestFactory().get(path)})
+        return [[(i.name, i['class'], i.children_url) for i in level]
+                for level in menus.draw_lazy_menu(context, 'main')['levels']]
+
+    def test_collapsed(self):
+        """Items with not drawn children are marked."""
+        i4_url = reverse('menu:menu_children', args=['main', self.i4.pk])
+        i2_url = reverse('menu:menu_children', args=['main', self.i2.pk])
+        for tree_cache in (True, False):
+            with override_settings(MENU_TREE_CACHE=tree_cache):
+                self.assertEqual(self.levels('/i2'), [
+                    [('Index', 'selected', None),
+                     ('I4', 'root has-children', i4_url)],
+                    [('I2', 'current', None)],
+                    [('I3', 'child', None)]])
+                self.assertEqual(self.levels('/'), [
+                    [('Index', 'current', None),
+                     ('I4', 'root has-children', i4_url)],
+                    [('I2', 'child has-children', i2_url)]])
+
+        html = self.template.render(
+            Context({'request': RequestFactory().get('/')}))
+        self.assertIn('<li class="root has-children" data-children="{}">'
+                      .format(i4_url), html)
+
+    def test_without_urls(self):
+        """Items are marked without URLs when menu.urls is not used."""
+        with override_settings(ROOT_URLCONF='tests.test_tags'):
+            self.assertEqual(self.levels('/')[0][1],
+                             ('I4', 'root has-children', None))
+
+    def test_children(self):
+        """Children are served by parent id."""
+        url = reverse('menu:menu_children', args=['main', self.index.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.json(), {
+            'parent_id': self.index.pk,
+            'items': [{'id': self.i2.pk, 'name': 'I2', 'url': '/i2',
+                       'children_url': reverse('menu:menu_children',
+                                               args=['main', self.i2.pk])}]})
+        with self.assertNumQueries(0):
+            response = self.client.get(url,
+                                       HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        url = reverse('menu:menu_children', args=['main', self.i3.pk])
+        self.assertEqual(self.client.get(url).json()['items'], [])
+        url = reverse('menu:menu_children', args=['other', self.i3.pk])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    @override_settings(MENU_TREE_CACHE=False)
+    def test_children_version(self):
+        """Version is read before children, so ETag is never too new."""
+        calls = []
+        get_version = cache.get_version
+        load_children = views.load_children
+
+        def version(*args):
+            calls.append('version')
+            return get_version(*args)
+
+        def children(*args):
+            calls.append('children')
+            return load_children(*args)
+
+        url = reverse('menu:menu_children', args=['main', self.index.pk])
+        with mock.patch('menu.cache.get_version', version), \
+                mock.patch('menu.views.load_children', children):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(calls, ['version', 'children'])
@@ -0,0 +1,169 @@
+"""Item visibility rules tests."""
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+try:
+    from unittest import mock
+except:
+    import mock
+
+from django.contrib.auth.models import AnonymousUser, Permission, User
+from django.test import TestCase, RequestFactory
+from django.template import Context, Template
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from menu import cache
+from menu.models import Menu, Item
+from menu.templatetags import menus
+from menu.tree import MenuTree
+
+
+@override_settings(ROOT_URLCONF='tests.urls_json')
+class VisibilityTestCase(TestCase):
+    """Items are pruned by user's rights from shared tree."""
+
+    def setUp(self):
+        """Create menu with rules and users."""
+        cache.clear()
+        self.factory = RequestFactory()
+        self.menu = Menu.objects.create(name='main')
+        self.index = Item.objects.create(menu=self.menu, name='Index',
+                                         url='index')
+        self.i2 = Item.objects.create(menu=self.menu, name='I2', url='/i2',
+                                      parent=self.index,
+                                      visibility='authenticated')
+        Item.objects.create(menu=self.menu, name='I3', url='/i3',
+                            parent=self.i2)
+        Item.objects.create(menu=self.menu, name='Login', url='/i4',
+                            parent=self.index, order=1,
+                            visibility='anonymous')
+        Item.objects.create(menu=self.menu, name='Admin', url='/i5',
+                            parent=self.index, order=2, visibility='staff')
+        Item.objects.create(menu=self.menu, name='Edit', url='/i6',
+                            parent=self.index, order=3,
+                            permission='menu.change_menu')
+
+        self.user = User.objects.create_user('user')
+        self.other = User.objects.create_user('other')
+        self.editor = User.objects.create_user('editor')
+        self.editor.user_permissions.add(
+            Permission.objects.get(codename='change_menu'))
+        self.staff = User.objects.create_user('staff', is_staff=True)
+
+    def names(self, user, tag='draw_sql_menu', path='/'):
+        request = self.factory.get(path)
+        request.user = user
+        data = getattr(menus, tag)(Context({'request': request}), 'main')
+        return [[item.name for item in level] for level in data['levels']]
+
+    def test_rules(self):
+        """Users see items allowed by rules of items and ancestors."""
+        self.assertEqual(self.names(AnonymousUser()),
+                         [['Index'], ['Login']])
+        self.assertEqual(self.names(self.user), [['Index'], ['I2']])
+        self.assertEqual(self.names(self.staff),
+                         [['Index'], ['I2', 'Admin']])
+        self.assertEqual(self.names(self.editor),
+                         [['Index'], ['I2', 'Edit']])
+        # Hidden current item is not expanded
+        self.assertEqual(self.names(AnonymousUser(), path='/i3'),
+                         [['Index']])
+
+    def test_engines(self):
+        """All tags prune items like cached tree."""
+        for tag in ('draw_sql_menu', 'draw_orm_menu', 'draw_path_menu',
+                    'draw_lazy_menu'):
+            for user in (AnonymousUser(), self.user, self.editor):
+                for path in ('/', '/i2', '/i3'):
+                    expected = self.names(user, tag, path)
+                    with override_settings(MENU_TREE_CACHE=False):
+                        self.assertEqual(self.names(user, tag, path),
+                                         expected, (tag, user, path))
+
+    def test_shared(self):
+        """Users with the same rights share pruned tree and fragments."""
+        tree = cache.get_tree('main')
+        self.assertIs(tree.for_user(self.user), tree.for_user(self.other))
+        self.assertIsNot(tree.for_user(self.user),
+                         tree.for_user(self.editor))
+        self.assertIs(tree.for_user(None), tree.for_user(AnonymousUser()))
+
+        template = Template('{% load menus %}'
+                            '{% draw_sql_menu "main" cache=True %}')
+        keys = []
+        fragment_key = cache.fragment_key
+
+        def get_key(*args):
+            keys.append(fragment_key(*args))
+            return keys[-1]
+
+        with mock.patch('menu.cache.fragment_key', get_key):
+            for user in (self.user, self.other, self.editor):
+                request = self.factory.get('/')
+                request.user = user
+                template.render(Context({'request': request}))
+        self.assertEqual(keys[0], keys[1])
+        self.assertNotEqual(keys[0], keys[2])
+
+    def test_pruned_limit(self):
+        """Only recently used pruned trees are kept."""
+        tree = cache.get_tree('main')
+        with mock.patch.object(MenuTree, 'MAX_PRUNED', 2):
+            anonymous = tree.for_user(None)
+            user = tree.for_user(self.user)
+            self.assertIs(tree.for_user(None), anonymous)
+            tree.for_user(self.staff)
+            self.assertEqual(len(tree.pruned), 2)
+            self.assertIs(tree.for_user(None), anonymous)
+            self.assertIsNot(tree.for_user(self.user), user)
+
+    def test_size(self):
+        """Pruned trees are counted in size of cached tree."""
+        size = cache.TreeCache.get_size(cache.get_tree('main'))
+        Item.objects.filter(menu=self.menu).update(visibility='',
+                                                   permission='')
+        self.assertLess(cache.TreeCache.get_size(MenuTree.load('main')),
+                        size)
+
+    def test_no_rules(self):
+        """Trees without rules are not pruned."""
+        Item.objects.filter(menu=self.menu).update(visibility='',
+                                                   permission='')
+        tree = MenuTree.load('main')
+        self.assertIs(tree.for_user(self.user), tree)
+        self.assertIsNone(tree.rights)
+
+    def test_json(self):
+        """JSON menus are pruned and cached privately."""
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('menu:menu_json', args=['main']))
+        self.assertEqual([[i['name'] for i in level]
+                          for level in response.json()['levels']],
+                         [['Index'], ['I2']])
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('Cookie', response['Vary'])
+
+        for tree_cache in (True, False):
+            with override_settings(MENU_TREE_CACHE=tree_cache):
+                url = reverse('menu:menu_children',
+                              args=['main', self.index.pk])
+                self.assertEqual(
+                    [i['name'] for i in self.client.get(url).json()['items']],
+                    ['I2'])
+                url = reverse('menu:menu_children',
+                              args=['main', self.i2.pk])
+                self.assertEqual(self.client.get(url).status_code, 200)
+                self.client.logout()
+                self.assertEqual(self.client.get(url).status_code, 404)
+                self.client.force_login(self.user)
+
+    @mock.patch('django.db.transaction.on_commit',
+                lambda func, using=None: func())
+    def test_snapshot(self):
+        """Published snapshots keep rules."""
+        self.menu.publish()
+        with self.settings(MENU_SNAPSHOTS=True):
+            cache.clear()
+            self.assertEqual(self.names(AnonymousUser()),
+                             [['Index'], ['Login']])
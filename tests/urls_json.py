@@ -0,0 +1,12 @@
+from django.urls import include
+
+from tests.test_tags import urlpatterns as tag_urlpatterns
+
+try:
+    from django.urls import re_path
+except ImportError:  # Django < 2.0
+    from django.conf.urls import url as re_path
+
+urlpatterns = tag_urlpatterns + [
+    re_path(r'^menus/', include('menu.urls')),
+]
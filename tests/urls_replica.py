@@ -0,0 +1,21 @@
+from django.http import HttpResponse
+
+from menu.models import Item
+from tests.urls_json import urlpatterns as json_urlpatterns
+
+try:
+    from django.urls import re_path
+except ImportError:  # Django < 2.0
+    from django.conf.urls import url as re_path
+
+
+def rename(request, pk):
+    item = Item.objects.get(pk=pk)
+    item.name = request.GET['name']
+    item.save()
+    return HttpResponse()
+
+
+urlpatterns = json_urlpatterns + [
+    re_path(r'^rename/(?P<pk>\d+)$', rename),
+]
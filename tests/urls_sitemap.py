@@ -0,0 +1,13 @@
+from tests.urls_json import urlpatterns as json_urlpatterns
+
+from menu.views import menu_sitemap
+
+try:
+    from django.urls import re_path
+except ImportError:  # Django < 2.0
+    from django.conf.urls import url as re_path
+
+urlpatterns = json_urlpatterns + [
+    re_path(r'^sitemap\.xml$', menu_sitemap),
+    re_path(r'^main\.xml$', menu_sitemap, {'menu_names': ['main']}),
+]